@@ -238,8 +238,8 @@ def jwks():
 # ===============================
 # GLOBAL MEMORY STORE (for subtopic uploads)
 # ===============================
-# This is used by API routes for temporary storage
-_SUBTOPIC_UPLOADS = {}
+# Owned by the API routes; shared here so the cleanup below can expire it
+from routes.api_routes import _SUBTOPIC_UPLOADS
 
 def get_subtopic_uploads():
     """Get global subtopic uploads store."""
@@ -262,13 +262,13 @@ def cleanup_before_request():
         current_time = time.time()
         to_delete = []
         
-        for upload_id, data in _SUBTOPIC_UPLOADS.items():
+        for upload_id, data in list(_SUBTOPIC_UPLOADS.items()):
             upload_time = data.get('timestamp', 0)
             if current_time - upload_time > Config.UPLOAD_CLEANUP_HOURS * 3600:
                 to_delete.append(upload_id)
         
         for upload_id in to_delete:
-            del _SUBTOPIC_UPLOADS[upload_id]
+            _SUBTOPIC_UPLOADS.pop(upload_id, None)
         
         if to_delete:
             print(f"🧹 Cleaned up {len(to_delete)} old uploads from memory")
@@ -8,7 +8,7 @@ from flask_cors import CORS
 from grader import QuizGrader
 from ingestion import (
     parse_json_from_str_or_file,
-    extract_pdf_text_from_file,
+    extract_pdf_text_from_stream,
     responses_from_pdf_text,
 )
 
@@ -86,13 +86,13 @@ def create_app() -> Flask:
             return jsonify({"error": "missing responses_file"}), 400
         rf = request.files['responses_file']
         rname = (rf.filename or '').lower()
-        rbytes = rf.read()
 
         try:
             if rname.endswith('.json') or rf.mimetype == 'application/json':
-                responses = parse_json_from_str_or_file(rbytes)
+                responses = parse_json_from_str_or_file(rf.read())
             elif rname.endswith('.pdf') or rf.mimetype in {'application/pdf', 'application/x-pdf'}:
-                text = extract_pdf_text_from_file(rbytes)
+                # Large uploads are spooled to a temp file; map it instead of copying.
+                text = extract_pdf_text_from_stream(rf.stream)
                 responses = responses_from_pdf_text(text, quiz)
             else:
                 return jsonify({"error": "responses_file must be .json or .pdf"}), 400
@@ -1,34 +1,44 @@
 import os
+import json
 import math
+import atexit
+import threading
 import re
 import difflib
 import ast
-import subprocess
-import tempfile
-from pathlib import Path
+from collections import Counter
+from functools import lru_cache
 from dataclasses import dataclass
-from typing import Dict, Any, List, Tuple, Optional
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Tuple, Optional
 import logging
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 from dotenv import load_dotenv
 
-from llm import chat_json, DEFAULT_MODEL
+from llm import chat_json_cached, DEFAULT_MODEL
+from sandbox import (
+    SandboxPool,
+    is_supported as sandbox_is_supported,
+    run_batch as sandbox_run_batch,
+)
 from prompts import (
     SYSTEM_PROMPT_GRADE,
     SYSTEM_PROMPT_CODE,
     SYSTEM_PROMPT_DECISION,
     build_freeform_user_prompt,
+    build_freeform_batch_user_prompt,
     build_code_grading_prompt,
     build_decision_grading_prompt,
+    clip_for_prompt,
 )
 
 
 load_dotenv()
 
 
-@dataclass
+@dataclass(slots=True)
 class GradeResult:
     question_id: str
     type: str
@@ -41,6 +51,27 @@ class GradeResult:
     expected: Optional[str] = None
 
 
+def _result_to_dict(r: GradeResult) -> Dict[str, Any]:
+    """Serialize a GradeResult, omitting optional fields that are unset."""
+    d: Dict[str, Any] = {
+        "question_id": r.question_id,
+        "type": r.type,
+        "score": r.score,
+        "max_score": r.max_score,
+    }
+    if r.is_correct is not None:
+        d["is_correct"] = r.is_correct
+    if r.verdict is not None:
+        d["verdict"] = r.verdict
+    if r.feedback:
+        d["feedback"] = r.feedback
+    if r.criteria:
+        d["criteria"] = r.criteria
+    if r.expected is not None:
+        d["expected"] = r.expected
+    return d
+
+
 # Question type labels (for documentation / possible validation)
 QUESTION_TYPES: Dict[str, str] = {
     "mcq": "Multiple Choice",
@@ -60,6 +91,34 @@ QUESTION_TYPES: Dict[str, str] = {
     "scenario": "Scenario-based",
 }
 
+# Open-ended assignment task types (no fixed correct answer)
+ASSIGNMENT_TYPES = {
+    "assignment_task", "conceptual", "scenario", "research",
+    "project", "case_study", "comparative"
+}
+
+# Grading route for every accepted type alias. Unlisted types are graded
+# as free-form, or as assignments when they carry assignment metadata.
+_GRADER_DISPATCH: Dict[str, str] = {
+    "mcq": "mcq",
+    "true_false": "true_false",
+    "truefalse": "true_false",
+    "tf": "true_false",
+    "short": "freeform",
+    "long": "freeform",
+    **{t: "assignment" for t in ASSIGNMENT_TYPES},
+    "code_writing": "code",
+    "code_completion": "code",
+    "code_debugging": "code",
+    "code_output": "code_llm",
+    "code_explanation": "code_llm",
+    "decision": "decision",
+}
+
+# Routes that yield to the assignment grader when a question has both
+# assignment_type and grading_criteria (e.g. qtype stored as "decision").
+_ASSIGNMENT_OVERRIDABLE_ROUTES = {"code", "code_llm", "decision"}
+
 
 logging.basicConfig(
     level=logging.INFO,
@@ -88,6 +147,24 @@ def _norm_text(s: str) -> str:
         return (s or "").strip().lower()
 
 
+# Answers with fewer letters/digits than this ("", "-", "...") are scored
+# 0 without an LLM call. Set to 0 to send every non-empty answer to the LLM.
+GRADER_MIN_ANSWER_CHARS = int(os.getenv("GRADER_MIN_ANSWER_CHARS", "1"))
+
+
+def _is_near_empty(text: str) -> bool:
+    """True if text has fewer than GRADER_MIN_ANSWER_CHARS letters/digits."""
+    if not text:
+        return True
+    count = 0
+    for ch in text:
+        if ch.isalnum():
+            count += 1
+            if count >= GRADER_MIN_ANSWER_CHARS:
+                return False
+    return count < GRADER_MIN_ANSWER_CHARS
+
+
 def _letter_for_option_text(options: List[str], option_text: str) -> Optional[str]:
     try:
         norm = _norm_text(option_text)
@@ -121,62 +198,121 @@ def _letter_from_any(answer: Any, options: List[str]) -> Optional[str]:
         idx = int(s)
         if 0 <= idx < len(options):
             return chr(ord('A') + idx)
-    # option text
-    by_text = _letter_for_option_text(options, s)
-    if by_text:
-        return by_text
-    # Fuzzy: treat long free-text answers as best-match to options
-    try:
-        norm = _norm_text(s)
-        best = None
-        best_ratio = 0.0
-        for idx, opt in enumerate(options):
-            ratio = difflib.SequenceMatcher(None, norm, _norm_text(opt)).ratio()
-            if ratio > best_ratio:
-                best_ratio = ratio
-                best = idx
-        if best is not None and best_ratio >= 0.75:
-            return chr(ord('A') + best)
-    except Exception:
-        pass
-    return None
+    # option text (exact, then fuzzy best-match)
+    return _letter_for_option_text(options, s)
+
+
+_DEFAULT_MAX_SCORES: Mapping[str, float] = MappingProxyType({
+    "mcq": 1.0,
+    "true_false": 1.0,
+    "short": 3.0,
+    "long": 5.0,
+    "conceptual": 5.0,
+})
+
+_POLICY_WEIGHTS: Mapping[str, Mapping[str, float]] = MappingProxyType({
+    "strict": MappingProxyType({"accuracy": 0.7, "completeness": 0.2, "clarity": 0.1}),
+    "balanced": MappingProxyType({"accuracy": 0.5, "completeness": 0.3, "clarity": 0.2}),
+    "lenient": MappingProxyType({"accuracy": 0.4, "completeness": 0.3, "clarity": 0.3}),
+})
+
+
+# Completion budgets per question type. Generation time grows with output
+# length, so each budget is sized to the JSON its prompt asks for.
+_MAX_TOKENS_BY_TYPE: Mapping[str, int] = MappingProxyType({
+    "mcq": 300,
+    "true_false": 300,
+    "short": 700,
+    "long": 1100,
+    "conceptual": 1100,
+    "code_writing": 1400,
+    "code_completion": 1400,
+    "code_debugging": 1400,
+    "code_output": 1400,
+    "code_explanation": 1400,
+    "decision": 1400,
+    "scenario": 1400,
+    "case_study": 1400,
+})
+_CODE_QUALITY_MAX_TOKENS = 300
+# Submissions shorter than this with at most one def/class are not sent for
+# an LLM quality review; passing every test earns the full test score.
+_QUALITY_REVIEW_MIN_CHARS = 200
+
+
+def _max_tokens_for(qtype: str) -> int:
+    return _MAX_TOKENS_BY_TYPE.get(qtype, 1500)
 
 
 def _default_max_score(qtype: str) -> float:
-    return {
-        "mcq": 1.0,
-        "true_false": 1.0,
-        "short": 3.0,
-        "long": 5.0,
-        "conceptual": 5.0,
-    }.get(qtype, 1.0)
+    return _DEFAULT_MAX_SCORES.get(qtype, 1.0)
 
 
 def _policy_weights(policy: str) -> Dict[str, float]:
     p = (policy or "balanced").strip().lower()
-    if p == "strict":
-        return {"accuracy": 0.7, "completeness": 0.2, "clarity": 0.1}
-    if p == "lenient":
-        return {"accuracy": 0.4, "completeness": 0.3, "clarity": 0.3}
-    return {"accuracy": 0.5, "completeness": 0.3, "clarity": 0.2}
+    # Copy: callers may pass the weights on and must not alter the defaults.
+    return dict(_POLICY_WEIGHTS.get(p, _POLICY_WEIGHTS["balanced"]))
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=256)
+def _token_counts(text: str) -> Counter:
+    """Lower-cased word multiset; cached so a reference is tokenized once per run.
+    Callers must not mutate the returned Counter."""
+    return Counter(_WORD_RE.findall(text.lower()))
+
+
+def _multiset_overlap(a: Counter, b: Counter) -> int:
+    """Size of the multiset intersection, walking only the smaller Counter."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(min(n, b[w]) for w, n in a.items() if w in b)
 
 
 def _heuristic_overlap_score(ref: str, ans: str, max_score: float) -> Tuple[float, str]:
-    """Very lightweight fallback when no LLM available. Uses token overlap."""
+    """Very lightweight fallback when no LLM available. Uses multiset token F1."""
     if not ref:
         return 0.0, "No reference; unable to grade without LLM."
-    ref_tokens = set(re.findall(r"\w+", ref.lower()))
-    ans_tokens = set(re.findall(r"\w+", ans.lower()))
-    if not ref_tokens or not ans_tokens:
+    ref_counts = _token_counts(ref)
+    ans_counts = Counter(_WORD_RE.findall(ans.lower()))
+    if not ref_counts or not ans_counts:
         return 0.0, "Insufficient content for heuristic grading."
-    overlap = len(ref_tokens & ans_tokens)
-    recall = overlap / max(1, len(ref_tokens))
-    precision = overlap / max(1, len(ans_tokens))
+    overlap = _multiset_overlap(ref_counts, ans_counts)
+    recall = overlap / max(1, ref_counts.total())
+    precision = overlap / max(1, ans_counts.total())
     f1 = 0.0 if (recall + precision) == 0 else 2 * recall * precision / (recall + precision)
     score = round(max_score * min(1.0, f1 * 1.1), 2)
     return score, f"Heuristic grading used (no LLM). Token F1={f1:.2f}."
 
 
+_VERDICTS = frozenset({"correct", "partially_correct", "incorrect"})
+
+# (name, weight, fallback feedback) for the free-form rubric criteria.
+_FREEFORM_CRITERIA: Tuple[Tuple[str, float, str], ...] = (
+    ("accuracy", 0.5, "Evaluated for factual correctness"),
+    ("completeness", 0.3, "Evaluated for coverage"),
+    ("clarity", 0.2, "Evaluated for expression"),
+)
+_FREEFORM_CRITERION_NAMES = frozenset(name for name, _, _ in _FREEFORM_CRITERIA)
+
+
+def _verdict_for_score(
+    score: float,
+    max_score: float,
+    *,
+    incorrect_at: float = 0.3,
+    correct_at: float = 0.9,
+) -> str:
+    """Verdict from a score: correct at >= correct_at, incorrect at <= incorrect_at."""
+    if score >= correct_at * max_score:
+        return "correct"
+    if score <= incorrect_at * max_score:
+        return "incorrect"
+    return "partially_correct"
+
+
 def _validate_and_fix_llm_response(
     response: Dict[str, Any],
     max_score: float,
@@ -201,14 +337,8 @@ def _validate_and_fix_llm_response(
 
     # 2. Verdict
     raw_verdict = str(response.get("verdict", "")).strip().lower()
-    valid_verdicts = {"correct", "partially_correct", "incorrect"}
-    if raw_verdict not in valid_verdicts:
-        if score_val >= 0.9 * max_score:
-            raw_verdict = "correct"
-        elif score_val <= 0.1 * max_score:
-            raw_verdict = "incorrect"
-        else:
-            raw_verdict = "partially_correct"
+    if raw_verdict not in _VERDICTS:
+        raw_verdict = _verdict_for_score(score_val, max_score, incorrect_at=0.1)
         logger.warning("Invalid verdict for %s; inferred '%s' from score", question_id, raw_verdict)
     validated["verdict"] = raw_verdict
 
@@ -224,14 +354,13 @@ def _validate_and_fix_llm_response(
     if not isinstance(criteria_raw, list):
         criteria_raw = []
 
-    criterion_names = {"accuracy", "completeness", "clarity"}
     validated_criteria: List[Dict[str, Any]] = []
 
     for c in criteria_raw:
-        if not isinstance(c, Dict):
+        if not isinstance(c, dict):
             continue
         name = str(c.get("name", "")).lower()
-        if name not in criterion_names:
+        if name not in _FREEFORM_CRITERION_NAMES:
             continue
         try:
             c_score = float(c.get("score", 0.0))
@@ -253,33 +382,39 @@ def _validate_and_fix_llm_response(
         logger.warning("Invalid criteria for %s; generating defaults", question_id)
         validated_criteria = [
             {
-                "name": "accuracy",
-                "score": round(score_val * 0.5, 2),
-                "max": round(max_score * 0.5, 2),
-                "feedback": "Evaluated for factual correctness",
-            },
-            {
-                "name": "completeness",
-                "score": round(score_val * 0.3, 2),
-                "max": round(max_score * 0.3, 2),
-                "feedback": "Evaluated for coverage",
-            },
-            {
-                "name": "clarity",
-                "score": round(score_val * 0.2, 2),
-                "max": round(max_score * 0.2, 2),
-                "feedback": "Evaluated for expression",
-            },
+                "name": name,
+                "score": round(score_val * w, 2),
+                "max": round(max_score * w, 2),
+                "feedback": fb,
+            }
+            for name, w, fb in _FREEFORM_CRITERIA
         ]
 
     validated["criteria"] = validated_criteria
     return validated
 
 
-def _analyze_python_code(code: str) -> Dict[str, Any]:
+_AST_NODE_KINDS: Dict[type, str] = {
+    ast.FunctionDef: "function",
+    ast.AsyncFunctionDef: "function",
+    ast.ClassDef: "class",
+    ast.For: "loop",
+    ast.AsyncFor: "loop",
+    ast.While: "loop",
+    ast.If: "conditional",
+    ast.Import: "import",
+    ast.ImportFrom: "import_from",
+}
+
+
+@lru_cache(maxsize=1024)
+def _analyze_python_code(code: str) -> Mapping[str, Any]:
     """
     Perform static analysis on Python code.
     Returns syntax validity, structure info, and basic metrics.
+
+    Results are memoized per source string and returned as a read-only
+    mapping (name lists are tuples) so cached entries cannot be mutated.
     """
     analysis: Dict[str, Any] = {
         "is_valid_syntax": False,
@@ -295,39 +430,45 @@ def _analyze_python_code(code: str) -> Dict[str, Any]:
     }
 
     try:
-        lines = [
-            l.strip()
-            for l in code.split("\n")
-            if l.strip() and not l.strip().startswith("#")
-        ]
-        analysis["line_count"] = len(lines)
+        line_count = 0
+        for line in code.split("\n"):
+            stripped = line.strip()
+            if stripped and stripped[0] != "#":
+                line_count += 1
+        analysis["line_count"] = line_count
 
         tree = ast.parse(code)
         analysis["is_valid_syntax"] = True
 
+        # One dict lookup per node instead of an isinstance() chain.
+        kind_of = _AST_NODE_KINDS.get
         for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
+            kind = kind_of(type(node))
+            if kind is None:
+                continue
+            if kind == "function":
                 analysis["has_functions"] = True
                 analysis["function_names"].append(node.name)
-            elif isinstance(node, ast.ClassDef):
+            elif kind == "class":
                 analysis["has_classes"] = True
                 analysis["class_names"].append(node.name)
-            elif isinstance(node, (ast.For, ast.While)):
+            elif kind == "loop":
                 analysis["has_loops"] = True
-            elif isinstance(node, ast.If):
+            elif kind == "conditional":
                 analysis["has_conditionals"] = True
-            elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                if isinstance(node, ast.Import):
-                    analysis["imports"].extend(alias.name for alias in node.names)
-                else:
-                    analysis["imports"].append(node.module)
+            elif kind == "import":
+                analysis["imports"].extend(alias.name for alias in node.names)
+            else:  # import_from
+                analysis["imports"].append(node.module)
 
     except SyntaxError as e:
         analysis["error"] = f"Syntax error: {e}"
     except Exception as e:  # defensive
         analysis["error"] = f"Analysis error: {e}"
 
-    return analysis
+    for key in ("imports", "function_names", "class_names"):
+        analysis[key] = tuple(analysis[key])
+    return MappingProxyType(analysis)
 
 
 def _check_code_requirements(
@@ -336,7 +477,12 @@ def _check_code_requirements(
     """
     Check if code meets specific structural / style requirements.
     """
+    if not code.strip():
+        return [("valid_syntax", False, "Empty submission")]
+
     checks: List[Tuple[str, bool, str]] = []
+    # Parsed even for keyword-only rubrics: the syntax check below is always
+    # reported. Analysis is memoized, so regrading the same code is free.
     analysis = _analyze_python_code(code)
 
     # Syntax check (always first)
@@ -408,11 +554,232 @@ def _check_code_requirements(
     return checks
 
 
+# Persistent sandbox workers shared by every grader in this process.
+SANDBOX_WORKERS = int(os.getenv("GRADER_SANDBOX_WORKERS", "4"))
+SANDBOX_PREWARM = os.getenv("GRADER_SANDBOX_PREWARM", "1") == "1"
+_SANDBOX_POOL: Optional[SandboxPool] = None
+_SANDBOX_POOL_LOCK = threading.Lock()
+
+
+def _get_sandbox_pool() -> Optional[SandboxPool]:
+    """Lazily start the shared sandbox pool (None where fork() is unavailable)."""
+    global _SANDBOX_POOL
+    if not sandbox_is_supported():
+        return None
+    with _SANDBOX_POOL_LOCK:
+        if _SANDBOX_POOL is None:
+            _SANDBOX_POOL = SandboxPool(size=SANDBOX_WORKERS)
+            atexit.register(_SANDBOX_POOL.close)
+    return _SANDBOX_POOL
+
+
+def prewarm_sandbox() -> None:
+    """Spawn the sandbox workers in the background (no-op where unsupported)."""
+    pool = _get_sandbox_pool()
+    if pool is not None:
+        threading.Thread(
+            target=pool.prewarm, name="sandbox-prewarm", daemon=True
+        ).start()
+
+
+# Upper bound on questions graded concurrently within one quiz.
+GRADER_MAX_WORKERS = int(os.getenv("GRADER_MAX_WORKERS", "8"))
+# Upper bound on submissions graded concurrently by grade_batch.
+GRADER_BATCH_WORKERS = int(os.getenv("GRADER_BATCH_WORKERS", str(os.cpu_count() or 4)))
+
+# Background threads for LLM calls that are issued speculatively while
+# other grading work (e.g. running test cases) is still in progress.
+_LLM_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GRADER_LLM_WORKERS", "4")),
+    thread_name_prefix="grader-llm",
+)
+
+
+@lru_cache(maxsize=1024)
+def _mcq_fallback_prompt_parts(
+    question: str, options: Tuple[str, ...], gold_letter: Optional[str]
+) -> Tuple[str, str]:
+    """
+    MCQ interpretation prompt split around the student response, so the
+    per-question part is assembled once and reused for every student.
+    """
+    options_str = "\n".join(
+        f"{chr(65 + i)}) {opt}" for i, opt in enumerate(options)
+    )
+    head = f"""
+Determine which option (A, B, C, or D) the student selected.
+
+QUESTION: {question}
+
+OPTIONS:
+{options_str}
+
+CORRECT ANSWER: {gold_letter or 'Not specified'}
+
+STUDENT RESPONSE: """
+    tail = """
+
+The student's response might be:
+- A letter (A/B/C/D)
+- An option number (0/1/2/3)
+- The full option text
+- A paraphrase of an option
+- Conversational (e.g., "I think it's B")
+
+Determine which option best matches their response.
+
+Return JSON:
+{
+  "matched_letter": "A|B|C|D|UNCLEAR",
+  "is_correct": true|false|null,
+  "confidence": 0.0-1.0,
+  "reasoning": "brief explanation"
+}
+"""
+    return head, tail
+
+
+# Unparseable MCQ answers interpreted per LLM call in grade_quiz.
+MCQ_BATCH_SIZE = 10
+# Free-form answers graded per LLM call in grade_quiz (0 or 1: one call per
+# question). Batching sends the system prompt once, but the combined reply
+# takes longer to generate than concurrent single calls and is cached only
+# as a whole, so it is off by default.
+FREEFORM_BATCH_SIZE = int(os.getenv("GRADER_FREEFORM_BATCH_SIZE", "0"))
+
+
+def _build_mcq_batch_prompt(
+    items: List[Tuple[Dict[str, Any], Any]], golds: List[Optional[str]]
+) -> str:
+    payload = [
+        {
+            "item": n,
+            "question": q.get("prompt", ""),
+            "options": {
+                chr(65 + i): opt for i, opt in enumerate(q.get("options") or [])
+            },
+            "correct_answer": gold or "Not specified",
+            "student_response": str(ans),
+        }
+        for n, ((q, ans), gold) in enumerate(zip(items, golds))
+    ]
+    return f"""
+For each item below, determine which option (A, B, C, or D) the student selected.
+
+ITEMS:
+{json.dumps(payload, ensure_ascii=False, indent=1)}
+
+A student's response might be:
+- A letter (A/B/C/D)
+- An option number (0/1/2/3)
+- The full option text
+- A paraphrase of an option
+- Conversational (e.g., "I think it's B")
+
+Return JSON with one entry per item:
+{{
+  "results": [
+    {{
+      "item": <item number>,
+      "matched_letter": "A|B|C|D|UNCLEAR",
+      "confidence": 0.0-1.0,
+      "reasoning": "brief explanation"
+    }}
+  ]
+}}
+"""
+
+
+def _freeform_reference(q: Dict[str, Any]) -> Optional[str]:
+    """First reference answer found on a free-form question, as a string."""
+    # Prefer a string reference; if dict or list appears, stringify
+    ref_candidates = [
+        q.get("answer"),
+        q.get("reference_answer"),
+        q.get("expected_answer"),
+        q.get("ideal_answer"),
+        q.get("solution"),
+        q.get("model_answer"),
+    ]
+    for rc in ref_candidates:
+        if rc is None:
+            continue
+        if isinstance(rc, str):
+            return rc
+        try:
+            return str(rc)
+        except Exception:
+            continue
+    return None
+
+
+def _build_code_quality_prompt(student_code: str) -> str:
+    return f"""
+The student's code passed all test cases.
+Rate its quality 0.0-1.0 on: readability/style, efficiency, best practices, comments.
+Return JSON: {{"quality_score": <0.0-1.0>, "quality_feedback": "<brief assessment>"}}
+
+CODE:
+```python
+{clip_for_prompt(student_code)}
+```
+"""
+
+
+# Kept free of per-question data so every assignment call sends the same
+# system prompt; the type-specific guidance goes into the user prompt.
+_ASSIGNMENT_SYSTEM_PROMPT = """You are an expert academic examiner grading open-ended assignment tasks.
+
+IMPORTANT: There is NO single correct answer. You must assess quality of thinking.
+Follow the TYPE GUIDANCE given with each question.
+
+GRADING PRINCIPLES:
+- A strong answer demonstrates deep understanding, not memorised facts
+- Partial credit is normal — most real answers are partially correct
+- Reward original thinking when it is sound
+- Do not penalise alternative valid approaches
+- Assess whether requirements are met, not whether a specific answer appears
+
+VERDICT SCALE:
+- "correct"           → score ≥ 80% of max (strong, meets all requirements)
+- "partially_correct" → score 30–79% of max (shows understanding, gaps remain)
+- "incorrect"         → score < 30% of max (does not demonstrate understanding)
+
+Return ONLY valid JSON with keys: score, max_score, verdict, feedback, criteria."""
+
+_ASSIGNMENT_TYPE_GUIDANCE = {
+    "conceptual":  "Focus on depth of understanding. Accept paraphrased explanations.",
+    "scenario":    "Reward structured reasoning and trade-off awareness.",
+    "research":    "Check evidence quality, not opinion. Depth > breadth.",
+    "project":     "Assess feasibility and completeness of proposed solution.",
+    "case_study":  "Look for multi-stakeholder thinking and justified conclusions.",
+    "comparative": "Require explicit criteria for comparison, not just description.",
+}
+
+
+def _test_case_result(
+    idx: int, test: Dict[str, Any], actual_output: str, stderr: str
+) -> Dict[str, Any]:
+    expected = test.get("expected_output", "")
+    return {
+        "test": idx,
+        "description": test.get("description", f"Test {idx + 1}"),
+        "passed": actual_output.strip() == expected.strip(),
+        "output": actual_output,
+        "expected": expected,
+        "error": stderr or None,
+    }
+
+
 def _execute_python_code(
-    code: str, test_cases: List[Dict[str, Any]], timeout: int = 5
+    code: str,
+    test_cases: List[Dict[str, Any]],
+    timeout: int = 5,
 ) -> Dict[str, Any]:
     """
     Safely execute Python code with test cases.
+    Uses the persistent sandbox pool when available, otherwise one fresh
+    interpreter per test case.
     """
     result: Dict[str, Any] = {
         "executed": False,
@@ -420,56 +787,51 @@ def _execute_python_code(
         "error": None,
     }
 
+    inputs = [test.get("input", "") for test in test_cases]
+    pool = _get_sandbox_pool()
     try:
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as f:
-            f.write(code)
-            temp_file = f.name
-
-        try:
-            for idx, test in enumerate(test_cases):
-                test_input = test.get("input", "")
-                expected = test.get("expected_output", "")
-
-                proc = subprocess.run(
-                    ["python3", temp_file],
-                    input=test_input,
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout,
-                )
-
-                actual_output = proc.stdout
-                passed = actual_output.strip() == expected.strip()
-
-                result["results"].append(
-                    {
-                        "test": idx,
-                        "description": test.get(
-                            "description", f"Test {idx + 1}"
-                        ),
-                        "passed": passed,
-                        "output": actual_output,
-                        "expected": expected,
-                        "error": proc.stderr or None,
-                    }
-                )
-
-            result["executed"] = True
-
-        finally:
-            try:
-                Path(temp_file).unlink(missing_ok=True)
-            except Exception:
-                pass
-
-    except subprocess.TimeoutExpired:
-        result["error"] = f"Code execution timeout ({timeout}s)"
+        if pool is not None:
+            runs = pool.run(code, inputs, timeout)
+        else:
+            runs = sandbox_run_batch(code, inputs, timeout)
     except Exception as e:
         result["error"] = f"Execution error: {e}"
+        return result
+
+    if any(run.get("timed_out") for run in runs):
+        result["error"] = f"Code execution timeout ({timeout}s)"
+        return result
 
+    result["results"] = [
+        _test_case_result(idx, test, run.get("stdout", ""), run.get("stderr", ""))
+        for idx, (test, run) in enumerate(zip(test_cases, runs))
+    ]
+    result["executed"] = True
     return result
 
 
+# Type groups accepted by validate_quiz_structure.
+_TRUE_FALSE_TYPES = frozenset({"true_false", "truefalse", "tf"})
+_FREEFORM_TYPES = frozenset({"short", "long", "conceptual"})
+_CODE_AND_DECISION_TYPES = frozenset({
+    "code_writing",
+    "code_completion",
+    "code_debugging",
+    "code_output",
+    "code_explanation",
+    "decision",
+    "case_study",
+    "scenario",
+})
+_REFERENCE_FIELDS = (
+    "answer",
+    "reference_answer",
+    "expected_answer",
+    "ideal_answer",
+    "solution",
+)
+
+
 def validate_quiz_structure(quiz: Dict[str, Any]) -> Tuple[bool, List[str]]:
     """
     Validate quiz structure and return (is_valid, list_of_errors).
@@ -509,34 +871,16 @@ def validate_quiz_structure(quiz: Dict[str, Any]) -> Tuple[bool, List[str]]:
                 errors.append(
                     f"Question {q_id}: MCQ must have at least 2 'options'"
                 )
-        elif qtype in {"true_false", "truefalse", "tf"}:
+        elif qtype in _TRUE_FALSE_TYPES:
             pass
-        elif qtype in {"short", "long", "conceptual"}:
-            has_reference = any(
-                q.get(field)
-                for field in [
-                    "answer",
-                    "reference_answer",
-                    "expected_answer",
-                    "ideal_answer",
-                    "solution",
-                ]
-            )
+        elif qtype in _FREEFORM_TYPES:
+            has_reference = any(q.get(field) for field in _REFERENCE_FIELDS)
             if not has_reference:
                 # This is a soft warning, not a hard error.
                 errors.append(
                     f"Question {q_id}: WARNING - no reference answer provided (grading may be less accurate)"
                 )
-        elif qtype in {
-            "code_writing",
-            "code_completion",
-            "code_debugging",
-            "code_output",
-            "code_explanation",
-            "decision",
-            "case_study",
-            "scenario",
-        }:
+        elif qtype in _CODE_AND_DECISION_TYPES:
             # For now, only basic checks on these new types
             pass
         else:
@@ -607,6 +951,8 @@ class QuizGrader:
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
         self.model = model or DEFAULT_MODEL
         self.default_policy = default_policy
+        if SANDBOX_PREWARM:
+            prewarm_sandbox()
 
     def _grade_mcq_with_llm_fallback(self, q: Dict[str, Any], ans: Any) -> GradeResult:
         """
@@ -643,40 +989,11 @@ class QuizGrader:
         # try an LLM to interpret the student's response.
         if student_letter is None and self.api_key and ans:
             try:
-                options_str = "\n".join(
-                    f"{chr(65 + i)}) {opt}" for i, opt in enumerate(options)
+                head, tail = _mcq_fallback_prompt_parts(
+                    str(q.get("prompt", "")), tuple(options), gold_letter
                 )
-
-                llm_prompt = f"""
-Determine which option (A, B, C, or D) the student selected.
-
-QUESTION: {q.get('prompt', '')}
-
-OPTIONS:
-{options_str}
-
-CORRECT ANSWER: {gold_letter or 'Not specified'}
-
-STUDENT RESPONSE: {ans}
-
-The student's response might be:
-- A letter (A/B/C/D)
-- An option number (0/1/2/3)
-- The full option text
-- A paraphrase of an option
-- Conversational (e.g., "I think it's B")
-
-Determine which option best matches their response.
-
-Return JSON:
-{{
-  "matched_letter": "A|B|C|D|UNCLEAR",
-  "is_correct": true|false|null,
-  "confidence": 0.0-1.0,
-  "reasoning": "brief explanation"
-}}
-"""
-                raw = chat_json(
+                llm_prompt = f"{head}{ans}{tail}"
+                raw = chat_json_cached(
                     system_prompt=(
                         "You are an expert at interpreting student responses to "
                         "multiple choice questions. Return only valid JSON."
@@ -685,69 +1002,234 @@ Return JSON:
                     api_key=self.api_key,
                     model=self.model,
                     temperature=0.0,
-                    max_tokens=300,
+                    max_tokens=_max_tokens_for("mcq"),
                 )
 
-                matched = str(raw.get("matched_letter", "")).upper()
-                confidence = float(raw.get("confidence", 0.0) or 0.0)
-                reasoning = str(raw.get("reasoning", "")).strip()
-
-                if matched in {"A", "B", "C", "D"} and confidence >= 0.7:
-                    is_correct = (
-                        gold_letter is not None and matched == gold_letter
-                    )
-                    score = max_score if is_correct else 0.0
-                    prefix = (
-                        "Correct. "
-                        if is_correct
-                        else f"Incorrect. Expected {gold_letter}. "
-                    )
-                    fb = prefix + f"Interpreted as {matched}. {reasoning}"
-
-                    return GradeResult(
-                        question_id=qid,
-                        type="mcq",
-                        score=score,
-                        max_score=max_score,
-                        is_correct=is_correct,
-                        verdict="correct" if is_correct else "incorrect",
-                        feedback=fb,
-                    )
-
-                # Low confidence or unclear match
-                return GradeResult(
-                    question_id=qid,
-                    type="mcq",
-                    score=0.0,
-                    max_score=max_score,
-                    is_correct=None,
-                    verdict="unclear",
-                    feedback=(
-                        "Could not confidently interpret answer."
-                        + (f" {reasoning}" if reasoning else "")
-                    ),
+                return self._mcq_result_from_interpretation(
+                    q, raw, gold_letter
                 )
 
             except Exception as e:
                 logger.error("LLM MCQ fallback failed for %s: %s", qid, e)
                 # Fall through to default behaviour below
 
-        # Default behaviour when we cannot interpret the answer or no API key
+        return self._mcq_uninterpreted_result(q, gold_letter)
+
+    def _mcq_result_from_interpretation(
+        self, q: Dict[str, Any], raw: Dict[str, Any], gold_letter: Optional[str]
+    ) -> GradeResult:
+        """Turn an LLM interpretation of an MCQ answer into a GradeResult."""
+        qid = q.get("id") or ""
+        max_score = float(q.get("max_score") or _default_max_score("mcq"))
+
+        matched = str(raw.get("matched_letter", "")).upper()
+        try:
+            confidence = float(raw.get("confidence", 0.0) or 0.0)
+        except (TypeError, ValueError):
+            # e.g. "confidence": "high"; treat as not confident.
+            confidence = 0.0
+        reasoning = str(raw.get("reasoning", "")).strip()
+
+        if matched in {"A", "B", "C", "D"} and confidence >= 0.7:
+            is_correct = (
+                gold_letter is not None and matched == gold_letter
+            )
+            score = max_score if is_correct else 0.0
+            prefix = (
+                "Correct. "
+                if is_correct
+                else f"Incorrect. Expected {gold_letter}. "
+            )
+            fb = prefix + f"Interpreted as {matched}. {reasoning}"
+
+            return GradeResult(
+                question_id=qid,
+                type="mcq",
+                score=score,
+                max_score=max_score,
+                is_correct=is_correct,
+                verdict="correct" if is_correct else "incorrect",
+                feedback=fb,
+            )
+
+        # Low confidence or unclear match
+        return GradeResult(
+            question_id=qid,
+            type="mcq",
+            score=0.0,
+            max_score=max_score,
+            is_correct=None,
+            verdict="unclear",
+            feedback=(
+                "Could not confidently interpret answer."
+                + (f" {reasoning}" if reasoning else "")
+            ),
+        )
+
+    def _mcq_uninterpreted_result(
+        self, q: Dict[str, Any], gold_letter: Optional[str]
+    ) -> GradeResult:
+        """Default result when an MCQ answer could not be interpreted."""
         if gold_letter is None:
             fb = "No ground truth provided."
         else:
             fb = f"Could not interpret answer. Expected {gold_letter}."
 
         return GradeResult(
-            question_id=qid,
+            question_id=q.get("id") or "",
             type="mcq",
             score=0.0,
-            max_score=max_score,
+            max_score=float(q.get("max_score") or _default_max_score("mcq")),
             is_correct=None,
             verdict=None,
             feedback=fb,
         )
 
+    def _needs_mcq_interpretation(self, q: Dict[str, Any], ans: Any) -> bool:
+        """True when an MCQ answer can't be parsed locally and the LLM is available."""
+        if not (self.api_key and ans):
+            return False
+        return _letter_from_any(ans, list(q.get("options") or [])) is None
+
+    def _grade_mcqs_batched(
+        self, items: List[Tuple[Dict[str, Any], Any]]
+    ) -> List[GradeResult]:
+        """
+        Interpret several unparseable MCQ answers with one LLM call per
+        MCQ_BATCH_SIZE items. Items missing from the reply, or a failed
+        call, fall back to the per-question path.
+        """
+        results: List[GradeResult] = []
+        for start in range(0, len(items), MCQ_BATCH_SIZE):
+            chunk = items[start:start + MCQ_BATCH_SIZE]
+            golds = [
+                _letter_from_any(q.get("answer"), list(q.get("options") or []))
+                for q, _ in chunk
+            ]
+            try:
+                raw = chat_json_cached(
+                    system_prompt=(
+                        "You are an expert at interpreting student responses to "
+                        "multiple choice questions. Return only valid JSON."
+                    ),
+                    user_prompt=_build_mcq_batch_prompt(chunk, golds),
+                    api_key=self.api_key,
+                    model=self.model,
+                    temperature=0.0,
+                    max_tokens=_max_tokens_for("mcq") * len(chunk),
+                )
+                by_item = {
+                    int(r.get("item")): r
+                    for r in raw.get("results") or []
+                    if isinstance(r, dict) and str(r.get("item", "")).isdigit()
+                }
+            except Exception as e:
+                logger.error("Batched LLM MCQ fallback failed: %s", e)
+                by_item = {}
+
+            for n, ((q, ans), gold) in enumerate(zip(chunk, golds)):
+                if n in by_item:
+                    results.append(
+                        self._mcq_result_from_interpretation(q, by_item[n], gold)
+                    )
+                else:
+                    results.append(self._grade_mcq_with_llm_fallback(q, ans))
+        return results
+
+    def _grade_freeforms_batched(
+        self,
+        items: List[Tuple[Dict[str, Any], Any]],
+        *,
+        policy: str,
+        rubric_weighting: Optional[Dict[str, float]] = None,
+    ) -> List[GradeResult]:
+        """
+        Grade several free-form answers with one LLM call per
+        FREEFORM_BATCH_SIZE items. Answers that never reach the LLM (empty,
+        verbatim reference, no API key), items missing from the reply and
+        failed calls all go through _grade_freeform.
+        """
+        results: List[Optional[GradeResult]] = [None] * len(items)
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+        for n, (q, ans) in enumerate(items):
+            student_answer = (str(ans) if ans is not None else "").strip()
+            reference = _freeform_reference(q)
+            if (
+                not self.api_key
+                or _is_near_empty(student_answer)
+                or (reference and _norm_text(student_answer) == _norm_text(reference))
+            ):
+                results[n] = self._grade_freeform(
+                    q, ans, policy=policy, rubric_weights=rubric_weighting
+                )
+                continue
+            qtype = q.get("type") or "short"
+            pending.append(
+                (
+                    n,
+                    {
+                        "question_prompt": (
+                            q.get("prompt") or q.get("question_text") or ""
+                        ).strip(),
+                        "student_answer": student_answer,
+                        "reference_answer": reference,
+                        "max_score": float(
+                            q.get("max_score") or _default_max_score(qtype)
+                        ),
+                        "rubric_weights": rubric_weighting or _policy_weights(policy),
+                    },
+                )
+            )
+
+        size = max(1, FREEFORM_BATCH_SIZE)
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            try:
+                raw = chat_json_cached(
+                    system_prompt=SYSTEM_PROMPT_GRADE,
+                    user_prompt=build_freeform_batch_user_prompt(
+                        items=[item for _, item in chunk], policy=policy
+                    ),
+                    api_key=self.api_key,
+                    model=self.model,
+                    temperature=0.1,
+                    max_tokens=sum(
+                        _max_tokens_for((items[n][0].get("type") or "short").strip().lower())
+                        for n, _ in chunk
+                    ),
+                )
+                by_item = {
+                    int(r.get("item")): r
+                    for r in raw.get("results") or []
+                    if isinstance(r, dict) and str(r.get("item", "")).isdigit()
+                }
+            except Exception as e:
+                logger.error("Batched free-form grading failed: %s", e)
+                by_item = {}
+
+            for pos, (n, item) in enumerate(chunk):
+                q, ans = items[n]
+                if pos not in by_item:
+                    results[n] = self._grade_freeform(
+                        q, ans, policy=policy, rubric_weights=rubric_weighting
+                    )
+                    continue
+                qid = q.get("id") or ""
+                validated = _validate_and_fix_llm_response(
+                    by_item[pos], max_score=item["max_score"], question_id=qid
+                )
+                results[n] = GradeResult(
+                    question_id=qid,
+                    type=q.get("type") or "short",
+                    score=validated["score"],
+                    max_score=item["max_score"],
+                    verdict=validated["verdict"],
+                    feedback=validated["feedback"],
+                    criteria=validated["criteria"],
+                    expected=item["reference_answer"],
+                )
+        return results
+
     def _grade_mcq(self, q: Dict[str, Any], ans: Any) -> GradeResult:
         """Wrapper to use the enhanced MCQ grading with LLM fallback."""
         return self._grade_mcq_with_llm_fallback(q, ans)
@@ -787,58 +1269,54 @@ Return JSON:
 
         prompt = (q.get("prompt") or q.get("question_text") or "").strip()
         student_answer = (str(ans) if ans is not None else "").strip()
-        reference_answer = None
-        # Prefer a string reference; if dict or list appears, stringify
-        ref_candidates = [
-            q.get("answer"),
-            q.get("reference_answer"),
-            q.get("expected_answer"),
-            q.get("ideal_answer"),
-            q.get("solution"),
-            q.get("model_answer"),
-        ]
-        for rc in ref_candidates:
-            if rc is None:
-                continue
-            if isinstance(rc, str):
-                reference_answer = rc
-                break
-            try:
-                reference_answer = str(rc)
-                break
-            except Exception:
-                continue
+        reference_answer = _freeform_reference(q)
 
         weights = rubric_weights or _policy_weights(policy)
 
-        # Short-circuit: empty answer
-        if not student_answer:
+        # Short-circuit: answer is the reference verbatim (modulo case/punctuation)
+        if (
+            student_answer
+            and reference_answer
+            and _norm_text(student_answer) == _norm_text(reference_answer)
+        ):
+            fb = "Exact match with the reference answer."
+            return GradeResult(
+                question_id=qid,
+                type=qtype,
+                score=max_score,
+                max_score=max_score,
+                verdict="correct",
+                feedback=fb,
+                criteria=[
+                    {
+                        "name": name,
+                        "score": round(max_score * w, 2),
+                        "max": round(max_score * w, 2),
+                        "feedback": fb,
+                    }
+                    for name, w in weights.items()
+                ],
+                expected=reference_answer,
+            )
+
+        # Short-circuit: empty or content-free answer ("-", "...")
+        if _is_near_empty(student_answer):
+            fb = "No answer provided." if not student_answer else "Answer too short to grade."
             return GradeResult(
                 question_id=qid,
                 type=qtype,
                 score=0.0,
                 max_score=max_score,
                 verdict="incorrect",
-                feedback="No answer provided.",
+                feedback=fb,
                 criteria=[
                     {
-                        "name": "accuracy",
-                        "score": 0.0,
-                        "max": round(max_score * 0.5, 2),
-                        "feedback": "No answer provided.",
-                    },
-                    {
-                        "name": "completeness",
-                        "score": 0.0,
-                        "max": round(max_score * 0.3, 2),
-                        "feedback": "No answer provided.",
-                    },
-                    {
-                        "name": "clarity",
+                        "name": name,
                         "score": 0.0,
-                        "max": round(max_score * 0.2, 2),
-                        "feedback": "No answer provided.",
-                    },
+                        "max": round(max_score * w, 2),
+                        "feedback": fb,
+                    }
+                    for name, w, _ in _FREEFORM_CRITERIA
                 ],
             )
 
@@ -882,13 +1360,13 @@ Return JSON:
         )
 
         try:
-            raw = chat_json(
+            raw = chat_json_cached(
                 system_prompt=SYSTEM_PROMPT_GRADE,
                 user_prompt=user_prompt,
                 api_key=self.api_key,
                 model=self.model,
                 temperature=0.1,
-                max_tokens=1500,
+                max_tokens=_max_tokens_for(qtype.strip().lower()),
             )
             validated = _validate_and_fix_llm_response(
                 raw,
@@ -978,12 +1456,7 @@ Return JSON:
 
         feedback = "\n".join(feedback_parts)
 
-        if score >= 0.9 * max_score:
-            verdict = "correct"
-        elif score <= 0.3 * max_score:
-            verdict = "incorrect"
-        else:
-            verdict = "partially_correct"
+        verdict = _verdict_for_score(score, max_score)
 
         return GradeResult(
             question_id=qid,
@@ -1010,6 +1483,8 @@ Return JSON:
         reference_code = q.get("reference_code") or q.get("solution_code")
         requirements = q.get("requirements") or {}
 
+        # Only a truly empty answer is skipped: code_output answers such as
+        # "[]" or "{}" are valid without any letters or digits.
         if not student_code:
             return GradeResult(
                 question_id=qid,
@@ -1040,26 +1515,23 @@ Return JSON:
         )
 
         try:
-            raw_response = chat_json(
+            raw_response = chat_json_cached(
                 system_prompt=SYSTEM_PROMPT_CODE,
                 user_prompt=user_prompt,
                 api_key=self.api_key,
                 model=self.model,
                 temperature=0.1,
-                max_tokens=2000,
+                max_tokens=_max_tokens_for(
+                    (q.get("type") or "code_writing").strip().lower()
+                ),
             )
 
             score = float(
                 max(0.0, min(max_score, float(raw_response.get("score", 0.0))))
             )
             verdict = (raw_response.get("verdict") or "").lower()
-            if verdict not in {"correct", "partially_correct", "incorrect"}:
-                if score >= 0.9 * max_score:
-                    verdict = "correct"
-                elif score <= 0.3 * max_score:
-                    verdict = "incorrect"
-                else:
-                    verdict = "partially_correct"
+            if verdict not in _VERDICTS:
+                verdict = _verdict_for_score(score, max_score)
 
             feedback = str(raw_response.get("feedback") or "").strip()
 
@@ -1156,8 +1628,32 @@ Return JSON:
                 feedback=f"Syntax Error: {analysis.get('error', 'Invalid Python syntax')}",
             )
 
+        # The quality review only counts if every test passes, but it does not
+        # depend on the results: start it now so it overlaps test execution.
+        # Trivial solutions skip it.
+        trivial = (
+            len(student_code) < _QUALITY_REVIEW_MIN_CHARS
+            and len(analysis["function_names"]) + len(analysis["class_names"]) < 2
+        )
+        quality_future = None
+        if self.api_key and not trivial:
+            quality_future = _LLM_EXECUTOR.submit(
+                chat_json_cached,
+                system_prompt=(
+                    "You are a code quality reviewer. "
+                    "Return only JSON."
+                ),
+                user_prompt=_build_code_quality_prompt(student_code),
+                api_key=self.api_key,
+                model=self.model,
+                temperature=0.1,
+                max_tokens=_CODE_QUALITY_MAX_TOKENS,
+            )
+
         execution = _execute_python_code(student_code, test_cases)
         if not execution.get("executed"):
+            if quality_future is not None:
+                quality_future.cancel()
             return GradeResult(
                 question_id=qid,
                 type="code_writing",
@@ -1189,40 +1685,10 @@ Return JSON:
 
         feedback = "\n".join(feedback_parts)
 
-        # Optional: if all tests passed, call LLM to assess code quality.
-        if self.api_key and passed == total and total > 0:
+        # Optional: if all tests passed, use the LLM code-quality assessment.
+        if quality_future is not None and passed == total and total > 0:
             try:
-                quality_prompt = f"""
-The student's code passed all test cases. Assess code quality:
-
-CODE:
-```python
-{student_code}
-```
-
-Rate code quality (0.0-1.0) based on:
-- Readability and style
-- Efficiency
-- Best practices
-- Comments and documentation
-
-Return JSON:
-{{
-  "quality_score": 0.0-1.0,
-  "quality_feedback": "brief assessment"
-}}
-"""
-                quality_response = chat_json(
-                    system_prompt=(
-                        "You are a code quality reviewer. "
-                        "Return only JSON."
-                    ),
-                    user_prompt=quality_prompt,
-                    api_key=self.api_key,
-                    model=self.model,
-                    temperature=0.1,
-                    max_tokens=500,
-                )
+                quality_response = quality_future.result()
                 quality_score = float(
                     quality_response.get("quality_score", 0.8)
                 )
@@ -1237,14 +1703,11 @@ Return JSON:
             except Exception:
                 final_score = test_score
         else:
+            if quality_future is not None:
+                quality_future.cancel()
             final_score = test_score
 
-        if final_score >= 0.9 * max_score:
-            verdict = "correct"
-        elif final_score <= 0.3 * max_score:
-            verdict = "incorrect"
-        else:
-            verdict = "partially_correct"
+        verdict = _verdict_for_score(final_score, max_score)
 
         return GradeResult(
             question_id=qid,
@@ -1278,7 +1741,7 @@ Return JSON:
             "communication": 0.2,
         }
 
-        if not student_answer:
+        if _is_near_empty(student_answer):
             return GradeResult(
                 question_id=qid,
                 type="decision",
@@ -1309,13 +1772,13 @@ Return JSON:
         )
 
         try:
-            raw_response = chat_json(
+            raw_response = chat_json_cached(
                 system_prompt=SYSTEM_PROMPT_DECISION,
                 user_prompt=user_prompt,
                 api_key=self.api_key,
                 model=self.model,
                 temperature=0.1,
-                max_tokens=2000,
+                max_tokens=_max_tokens_for("decision"),
             )
 
             score = float(
@@ -1388,336 +1851,342 @@ Return JSON:
                 feedback=f"Error during decision grading: {e}",
             )
 
-    # quiz grading/grader.py
-
-ASSIGNMENT_TYPES = {
-    "assignment_task", "conceptual", "scenario", "research",
-    "project", "case_study", "comparative"
-}
-
-def grade_quiz(
-    self,
-    *,
-    quiz: Dict[str, Any],
-    responses: Dict[str, Any],
-    policy: Optional[str] = None,
-    rubric_weighting: Optional[Dict[str, float]] = None,
-) -> Dict[str, Any]:
-    """
-    Grade a quiz with comprehensive validation and support for all types
-    including open-ended assignment tasks with no fixed correct answer.
-    """
-    start_time = datetime.now()
-    quiz_id = quiz.get("id")
-    logger.info("Starting grading for quiz %s", quiz_id)
-
-    # Quiz structure validation
-    is_valid, errors = validate_quiz_structure(quiz)
-    if not is_valid:
-        logger.error("Invalid quiz structure for %s: %s", quiz_id, errors)
-        return {
-            "quiz_id": quiz_id,
-            "error": "Invalid quiz structure",
-            "details": errors,
-            "total_score": 0.0,
-            "max_total": 0.0,
-            "percentage": 0.0,
-            "items": [],
-        }
-
-    # Responses validation (warnings only)
-    _, warnings = validate_responses(responses, quiz)
-
-    policy = (policy or self.default_policy).lower()
-    if policy not in {"strict", "balanced", "lenient"}:
-        warnings.append(f"Unknown policy '{policy}', using 'balanced'")
-        policy = "balanced"
+    def _grade_question(
+        self,
+        q: Dict[str, Any],
+        ans: Any,
+        qtype: str,
+        *,
+        policy: str,
+        rubric_weighting: Optional[Dict[str, float]],
+    ) -> GradeResult:
+        """Route one question to the grader for its type."""
+        route = _GRADER_DISPATCH.get(qtype)
+        if route is None:
+            logger.warning(
+                "Unknown question type '%s' for %s; treating as free-form",
+                qtype,
+                q.get("id"),
+            )
+            # Last-ditch: if it has assignment metadata, use assignment grader
+            if q.get("assignment_type") or q.get("grading_criteria"):
+                route = "assignment"
+            else:
+                route = "freeform"
+        elif (
+            route in _ASSIGNMENT_OVERRIDABLE_ROUTES
+            and q.get("assignment_type")
+            and q.get("grading_criteria")
+        ):
+            route = "assignment"
+        return self._ROUTES[route](self, q, ans, policy, rubric_weighting)
+
+    def _dispatch_code(
+        self, q: Dict[str, Any], ans: Any, *, policy: str
+    ) -> GradeResult:
+        """Pick the code grader based on what the question provides."""
+        if q.get("test_cases"):
+            return self._grade_code_with_tests(q, ans, policy=policy)
+        if q.get("requirements"):
+            return self._grade_code_static(q, ans, policy=policy)
+        return self._grade_code_with_llm(q, ans, policy=policy)
+
+    _ROUTES = {
+        "mcq": lambda self, q, ans, policy, weights: self._grade_mcq(q, ans),
+        "true_false": lambda self, q, ans, policy, weights: self._grade_true_false(q, ans),
+        "freeform": lambda self, q, ans, policy, weights: self._grade_freeform(
+            q, ans, policy=policy, rubric_weights=weights
+        ),
+        "assignment": lambda self, q, ans, policy, weights: self._grade_assignment_task(
+            q, ans, policy=policy
+        ),
+        "code": lambda self, q, ans, policy, weights: self._dispatch_code(
+            q, ans, policy=policy
+        ),
+        "code_llm": lambda self, q, ans, policy, weights: self._grade_code_with_llm(
+            q, ans, policy=policy
+        ),
+        "decision": lambda self, q, ans, policy, weights: self._grade_decision(
+            q, ans, policy=policy, rubric_weights=weights
+        ),
+    }
 
-    results: List[GradeResult] = []
+    def grade_quiz(
+        self,
+        *,
+        quiz: Dict[str, Any],
+        responses: Dict[str, Any],
+        policy: Optional[str] = None,
+        rubric_weighting: Optional[Dict[str, float]] = None,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Grade a quiz with comprehensive validation and support for all types
+        including open-ended assignment tasks with no fixed correct answer.
+        LLM- and sandbox-bound questions are graded concurrently on up to
+        ``max_workers`` threads (default GRADER_MAX_WORKERS).
+        """
+        start_time = time.perf_counter()
+        quiz_id = quiz.get("id")
+        logger.info("Starting grading for quiz %s", quiz_id)
+
+        # Quiz structure validation
+        is_valid, errors = validate_quiz_structure(quiz)
+        if not is_valid:
+            logger.error("Invalid quiz structure for %s: %s", quiz_id, errors)
+            return {
+                "quiz_id": quiz_id,
+                "error": "Invalid quiz structure",
+                "details": errors,
+                "total_score": 0.0,
+                "max_total": 0.0,
+                "percentage": 0.0,
+                "items": [],
+            }
 
-    qlist = list(quiz.get("questions") or [])
-    for q in qlist:
-        qid = q.get("id")
-        if not qid:
-            logger.warning("Question without ID encountered; skipping")
-            continue
+        # Responses validation (warnings only)
+        _, warnings = validate_responses(responses, quiz)
 
-        qtype = (q.get("type") or "").strip().lower() or "mcq"
-        ans = responses.get(qid)
+        policy = (policy or self.default_policy).lower()
+        if policy not in {"strict", "balanced", "lenient"}:
+            warnings.append(f"Unknown policy '{policy}', using 'balanced'")
+            policy = "balanced"
 
-        try:
-            if qtype == "mcq":
-                res = self._grade_mcq(q, ans)
+        results: List[GradeResult] = []
 
-            elif qtype in {"true_false", "truefalse", "tf"}:
-                res = self._grade_true_false(q, ans)
+        qlist = list(quiz.get("questions") or [])
 
-            elif qtype in {"short", "long"}:
-                res = self._grade_freeform(
+        # Everything except MCQ / True-False waits on the LLM or the code
+        # sandbox. When there are several such questions, start them all
+        # up-front so their I/O overlaps, and collect results in order below.
+        slow_questions = [
+            (idx, q) for idx, q in enumerate(qlist)
+            if q.get("id")
+            and _GRADER_DISPATCH.get(
+                (q.get("type") or "").strip().lower() or "mcq"
+            ) not in {"mcq", "true_false"}
+        ]
+        # With GRADER_FREEFORM_BATCH_SIZE > 1, free-form answers share calls.
+        freeform_batch: List[Tuple[int, Dict[str, Any]]] = []
+        if FREEFORM_BATCH_SIZE > 1 and self.api_key:
+            freeform_batch = [
+                (idx, q) for idx, q in slow_questions
+                if _GRADER_DISPATCH.get((q.get("type") or "").strip().lower())
+                == "freeform"
+            ]
+            if len(freeform_batch) < 2:
+                freeform_batch = []
+            batched_ids = {idx for idx, _ in freeform_batch}
+            slow_questions = [
+                (idx, q) for idx, q in slow_questions if idx not in batched_ids
+            ]
+        # MCQ answers that need the LLM to interpret are sent as one batch.
+        mcq_batch = [
+            (idx, q) for idx, q in enumerate(qlist)
+            if q.get("id")
+            and _GRADER_DISPATCH.get(
+                (q.get("type") or "").strip().lower() or "mcq"
+            ) == "mcq"
+            and self._needs_mcq_interpretation(q, responses.get(q["id"]))
+        ]
+        if len(mcq_batch) < 2:
+            mcq_batch = []
+
+        futures: Dict[int, Any] = {}
+        executor: Optional[ThreadPoolExecutor] = None
+        jobs = (
+            len(slow_questions)
+            + (1 if mcq_batch else 0)
+            + (1 if freeform_batch else 0)
+        )
+        workers = min(max_workers or GRADER_MAX_WORKERS, jobs)
+        if workers > 1:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            for idx, q in slow_questions:
+                futures[idx] = executor.submit(
+                    self._grade_question,
                     q,
-                    ans,
+                    responses.get(q["id"]),
+                    (q.get("type") or "").strip().lower() or "mcq",
                     policy=policy,
-                    rubric_weights=rubric_weighting,
+                    rubric_weighting=rubric_weighting,
                 )
 
-            # ── NEW: open-ended assignment tasks ──────────────────────────
-            elif qtype in ASSIGNMENT_TYPES:
-                res = self._grade_assignment_task(q, ans, policy=policy)
-
-            # Also catch assignment_task whose assignment_type is set
-            # but qtype was stored as something else (e.g. "long")
-            elif q.get("assignment_type") and q.get("grading_criteria"):
-                res = self._grade_assignment_task(q, ans, policy=policy)
-            # ─────────────────────────────────────────────────────────────
-
-            # Code-based types
-            elif qtype in {"code_writing", "code_completion", "code_debugging"}:
-                if q.get("test_cases"):
-                    res = self._grade_code_with_tests(q, ans, policy=policy)
-                elif q.get("requirements"):
-                    res = self._grade_code_static(q, ans, policy=policy)
-                else:
-                    res = self._grade_code_with_llm(q, ans, policy=policy)
+        # Question index -> (batch future, position in that batch's results).
+        batched: Dict[int, Tuple[Future, int]] = {}
+        for batch, grade_items in (
+            (mcq_batch, self._grade_mcqs_batched),
+            (
+                freeform_batch,
+                lambda items: self._grade_freeforms_batched(
+                    items, policy=policy, rubric_weighting=rubric_weighting
+                ),
+            ),
+        ):
+            if not batch:
+                continue
+            batch_items = [(q, responses.get(q["id"])) for _, q in batch]
+            if executor is not None:
+                batch_future = executor.submit(grade_items, batch_items)
+            else:
+                batch_future = Future()
+                batch_future.set_result(grade_items(batch_items))
+            for n, (idx, _) in enumerate(batch):
+                batched[idx] = (batch_future, n)
 
-            elif qtype in {"code_output", "code_explanation"}:
-                res = self._grade_code_with_llm(q, ans, policy=policy)
+        missing_ids: List[int] = []
+        for idx, q in enumerate(qlist):
+            qid = q.get("id")
+            if not qid:
+                missing_ids.append(idx)
+                continue
 
-            # Decision-based types
-            elif qtype in {"decision", "scenario", "case_study"}:
-                res = self._grade_decision(
-                    q,
-                    ans,
-                    policy=policy,
-                    rubric_weights=rubric_weighting,
-                )
+            qtype = (q.get("type") or "").strip().lower() or "mcq"
+            ans = responses.get(qid)
 
-            else:
-                logger.warning(
-                    "Unknown question type '%s' for %s; treating as free-form",
-                    qtype,
-                    qid,
-                )
-                # Last-ditch: if it has assignment metadata, use assignment grader
-                if q.get("assignment_type") or q.get("grading_criteria"):
-                    res = self._grade_assignment_task(q, ans, policy=policy)
+            try:
+                if idx in futures:
+                    res = futures[idx].result()
+                elif idx in batched:
+                    batch_future, n = batched[idx]
+                    res = batch_future.result()[n]
                 else:
-                    res = self._grade_freeform(
+                    res = self._grade_question(
                         q,
                         ans,
+                        qtype,
                         policy=policy,
-                        rubric_weights=rubric_weighting,
+                        rubric_weighting=rubric_weighting,
                     )
 
-        except Exception as e:
-            logger.error("Error grading %s: %s", qid, e)
-            max_score = float(
-                q.get("max_score") or q.get("marks") or _default_max_score(qtype)
-            )
-            res = GradeResult(
-                question_id=qid,
-                type=qtype,
-                score=0.0,
-                max_score=max_score,
-                verdict="error",
-                feedback=f"Grading failed: {e}",
-            )
-
-        results.append(res)
-
-    total = sum(r.score for r in results)
-    max_total = sum(r.max_score for r in results)
-    percentage = (total / max_total * 100.0) if max_total > 0 else 0.0
-
-    duration = (datetime.now() - start_time).total_seconds()
-    logger.info(
-        "Completed grading quiz %s in %.2fs - %.1f/%.1f (%.1f%%)",
-        quiz_id,
-        duration,
-        total,
-        max_total,
-        percentage,
-    )
-
-    result: Dict[str, Any] = {
-        "quiz_id": quiz_id,
-        "total_score": round(total, 2),
-        "max_total": round(max_total, 2),
-        "percentage": round(percentage, 1),
-        "items": [
-            {
-                "question_id": r.question_id,
-                "type": r.type,
-                "score": r.score,
-                "max_score": r.max_score,
-                **(
-                    {"is_correct": r.is_correct}
-                    if r.is_correct is not None
-                    else {}
-                ),
-                **({"verdict": r.verdict} if r.verdict is not None else {}),
-                **({"feedback": r.feedback} if r.feedback else {}),
-                **({"criteria": r.criteria} if r.criteria else {}),
-                **({"expected": r.expected} if r.expected is not None else {}),
-            }
-            for r in results
-        ],
-    }
+            except Exception as e:
+                logger.error("Error grading %s: %s", qid, e)
+                max_score = float(
+                    q.get("max_score") or q.get("marks") or _default_max_score(qtype)
+                )
+                res = GradeResult(
+                    question_id=qid,
+                    type=qtype,
+                    score=0.0,
+                    max_score=max_score,
+                    verdict="error",
+                    feedback=f"Grading failed: {e}",
+                )
 
-    if warnings:
-        result["warnings"] = warnings
+            results.append(res)
 
-    return result
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if missing_ids:
+            logger.warning(
+                "Skipped %d question(s) without ID at positions %s",
+                len(missing_ids),
+                missing_ids,
+            )
 
+        total = 0.0
+        max_total = 0.0
+        items: List[Dict[str, Any]] = []
+        for r in results:
+            total += r.score
+            max_total += r.max_score
+            items.append(_result_to_dict(r))
+        percentage = (total / max_total * 100.0) if max_total > 0 else 0.0
+
+        duration = time.perf_counter() - start_time
+        logger.info(
+            "Completed grading quiz %s in %.2fs - %.1f/%.1f (%.1f%%)",
+            quiz_id,
+            duration,
+            total,
+            max_total,
+            percentage,
+        )
 
-def grade_quiz_parallel(
-    self,
-    *,
-    quiz: Dict[str, Any],
-    responses: Dict[str, Any],
-    policy: Optional[str] = None,
-    rubric_weighting: Optional[Dict[str, float]] = None,
-    max_workers: int = 3,
-) -> Dict[str, Any]:
-    """
-    Grade a quiz using parallel LLM calls for slower free-form/code/assignment
-    questions. Fast types (MCQ/True-False) are graded sequentially.
-    """
-    start_time = datetime.now()
-    quiz_id = quiz.get("id")
-    logger.info("Starting parallel grading for quiz %s", quiz_id)
-
-    is_valid, errors = validate_quiz_structure(quiz)
-    if not is_valid:
-        logger.error("Invalid quiz structure for %s: %s", quiz_id, errors)
-        return {
+        result: Dict[str, Any] = {
             "quiz_id": quiz_id,
-            "error": "Invalid quiz structure",
-            "details": errors,
-            "total_score": 0.0,
-            "max_total": 0.0,
-            "percentage": 0.0,
-            "items": [],
+            "total_score": round(total, 2),
+            "max_total": round(max_total, 2),
+            "percentage": round(percentage, 1),
+            "items": items,
         }
 
-    _, warnings = validate_responses(responses, quiz)
-
-    policy = (policy or self.default_policy).lower()
-    if policy not in {"strict", "balanced", "lenient"}:
-        warnings.append(f"Unknown policy '{policy}', using 'balanced'")
-        policy = "balanced"
-
-    qlist = list(quiz.get("questions") or [])
+        if warnings:
+            result["warnings"] = warnings
 
-    fast_questions: List[Dict[str, Any]] = []
-    slow_questions: List[Dict[str, Any]] = []
+        return result
 
-    for q in qlist:
-        qtype = (q.get("type") or "").strip().lower()
-        if qtype in {"mcq", "true_false", "truefalse", "tf"}:
-            fast_questions.append(q)
-        else:
-            # Everything else (short, long, assignment types, code, decision)
-            # goes to the parallel pool
-            slow_questions.append(q)
-
-    results: List[GradeResult] = []
+    def grade_quiz_parallel(
+        self,
+        *,
+        quiz: Dict[str, Any],
+        responses: Dict[str, Any],
+        policy: Optional[str] = None,
+        rubric_weighting: Optional[Dict[str, float]] = None,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Grade a quiz using parallel LLM calls for slower free-form/code/assignment
+        questions. Fast types (MCQ/True-False) are graded sequentially.
+        At most ``max_workers`` (default GRADER_MAX_WORKERS) calls are in flight.
+        """
+        start_time = time.perf_counter()
+        quiz_id = quiz.get("id")
+        logger.info("Starting parallel grading for quiz %s", quiz_id)
+
+        is_valid, errors = validate_quiz_structure(quiz)
+        if not is_valid:
+            logger.error("Invalid quiz structure for %s: %s", quiz_id, errors)
+            return {
+                "quiz_id": quiz_id,
+                "error": "Invalid quiz structure",
+                "details": errors,
+                "total_score": 0.0,
+                "max_total": 0.0,
+                "percentage": 0.0,
+                "items": [],
+            }
 
-    # ── Grade fast questions sequentially ────────────────────────────────
-    for q in fast_questions:
-        qid = q.get("id")
-        if not qid:
-            logger.warning("Question without ID encountered; skipping")
-            continue
-        qtype = (q.get("type") or "").strip().lower() or "mcq"
-        ans = responses.get(qid)
-        try:
-            if qtype == "mcq":
-                res = self._grade_mcq(q, ans)
-            else:
-                res = self._grade_true_false(q, ans)
-        except Exception as e:
-            logger.error("Error grading %s: %s", qid, e)
-            max_score = float(
-                q.get("max_score") or q.get("marks") or _default_max_score(qtype)
-            )
-            res = GradeResult(
-                question_id=qid,
-                type=qtype,
-                score=0.0,
-                max_score=max_score,
-                verdict="error",
-                feedback=f"Grading failed: {e}",
-            )
-        results.append(res)
+        _, warnings = validate_responses(responses, quiz)
 
-    # ── Grade slow questions in parallel ─────────────────────────────────
-    def _grade_one(q: Dict[str, Any]) -> GradeResult:
-        qid_inner = q.get("id")
-        qtype_inner = (q.get("type") or "").strip().lower() or "short"
-        ans_inner = responses.get(qid_inner)
+        policy = (policy or self.default_policy).lower()
+        if policy not in {"strict", "balanced", "lenient"}:
+            warnings.append(f"Unknown policy '{policy}', using 'balanced'")
+            policy = "balanced"
 
-        # Short / Long answers with a reference answer
-        if qtype_inner in {"short", "long"}:
-            return self._grade_freeform(
-                q,
-                ans_inner,
-                policy=policy,
-                rubric_weights=rubric_weighting,
-            )
+        qlist = list(quiz.get("questions") or [])
 
-        # ── NEW: open-ended assignment tasks ──────────────────────────────
-        if qtype_inner in ASSIGNMENT_TYPES:
-            return self._grade_assignment_task(q, ans_inner, policy=policy)
-
-        # Catch questions whose qtype is anything but have assignment metadata
-        if q.get("assignment_type") and q.get("grading_criteria"):
-            return self._grade_assignment_task(q, ans_inner, policy=policy)
-        # ─────────────────────────────────────────────────────────────────
-
-        # Code-based types
-        if qtype_inner in {"code_writing", "code_completion", "code_debugging"}:
-            if q.get("test_cases"):
-                return self._grade_code_with_tests(q, ans_inner, policy=policy)
-            if q.get("requirements"):
-                return self._grade_code_static(q, ans_inner, policy=policy)
-            return self._grade_code_with_llm(q, ans_inner, policy=policy)
-
-        if qtype_inner in {"code_output", "code_explanation"}:
-            return self._grade_code_with_llm(q, ans_inner, policy=policy)
-
-        # Decision-based types
-        if qtype_inner in {"decision", "scenario", "case_study"}:
-            return self._grade_decision(
-                q,
-                ans_inner,
-                policy=policy,
-                rubric_weights=rubric_weighting,
-            )
+        fast_questions: List[Tuple[int, Dict[str, Any]]] = []
+        slow_questions: List[Tuple[int, Dict[str, Any]]] = []
 
-        # Final fallback: if it has assignment metadata use assignment grader,
-        # otherwise use generic freeform
-        if q.get("assignment_type") or q.get("grading_criteria"):
-            return self._grade_assignment_task(q, ans_inner, policy=policy)
+        for idx, q in enumerate(qlist):
+            qtype = (q.get("type") or "").strip().lower()
+            if _GRADER_DISPATCH.get(qtype) in {"mcq", "true_false"}:
+                fast_questions.append((idx, q))
+            else:
+                # Everything else (short, long, assignment types, code, decision)
+                # goes to the parallel pool
+                slow_questions.append((idx, q))
 
-        return self._grade_freeform(
-            q,
-            ans_inner,
-            policy=policy,
-            rubric_weights=rubric_weighting,
-        )
+        # Results are stored at their question's position, so they come out
+        # in quiz order without sorting.
+        slots: List[Optional[GradeResult]] = [None] * len(qlist)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_map = {
-            executor.submit(_grade_one, q): q for q in slow_questions
-        }
-        for future in as_completed(future_map):
-            q = future_map[future]
+        # ── Grade fast questions sequentially ────────────────────────────────
+        missing_ids = 0
+        for idx, q in fast_questions:
             qid = q.get("id")
-            qtype = (q.get("type") or "").strip().lower() or "short"
+            if not qid:
+                missing_ids += 1
+                continue
+            qtype = (q.get("type") or "").strip().lower() or "mcq"
+            ans = responses.get(qid)
             try:
-                res = future.result()
+                res = self._grade_question(
+                    q, ans, qtype, policy=policy, rubric_weighting=rubric_weighting
+                )
             except Exception as e:
-                logger.error("Error grading %s in parallel: %s", qid, e)
+                logger.error("Error grading %s: %s", qid, e)
                 max_score = float(
                     q.get("max_score") or q.get("marks") or _default_max_score(qtype)
                 )
@@ -1729,57 +2198,144 @@ def grade_quiz_parallel(
                     verdict="error",
                     feedback=f"Grading failed: {e}",
                 )
-            results.append(res)
+            slots[idx] = res
 
-    # Preserve original question order
-    order = {q.get("id"): idx for idx, q in enumerate(qlist)}
-    results.sort(key=lambda r: order.get(r.question_id, 1_000_000))
-
-    total = sum(r.score for r in results)
-    max_total = sum(r.max_score for r in results)
-    percentage = (total / max_total * 100.0) if max_total > 0 else 0.0
-
-    duration = (datetime.now() - start_time).total_seconds()
-    logger.info(
-        "Completed parallel grading quiz %s in %.2fs - %.1f/%.1f (%.1f%%)",
-        quiz_id,
-        duration,
-        total,
-        max_total,
-        percentage,
-    )
+        if missing_ids:
+            logger.warning("Skipped %d question(s) without ID", missing_ids)
 
-    result: Dict[str, Any] = {
-        "quiz_id": quiz_id,
-        "total_score": round(total, 2),
-        "max_total": round(max_total, 2),
-        "percentage": round(percentage, 1),
-        "items": [
-            {
-                "question_id": r.question_id,
-                "type": r.type,
-                "score": r.score,
-                "max_score": r.max_score,
-                **(
-                    {"is_correct": r.is_correct}
-                    if r.is_correct is not None
-                    else {}
-                ),
-                **({"verdict": r.verdict} if r.verdict is not None else {}),
-                **({"feedback": r.feedback} if r.feedback else {}),
-                **({"criteria": r.criteria} if r.criteria else {}),
-                **({"expected": r.expected} if r.expected is not None else {}),
+        # ── Grade slow questions in parallel ─────────────────────────────────
+        def _grade_one(q: Dict[str, Any]) -> GradeResult:
+            qid_inner = q.get("id")
+            qtype_inner = (q.get("type") or "").strip().lower() or "short"
+            ans_inner = responses.get(qid_inner)
+
+            return self._grade_question(
+                q,
+                ans_inner,
+                qtype_inner,
+                policy=policy,
+                rubric_weighting=rubric_weighting,
+            )
+
+        workers = max(1, min(max_workers or GRADER_MAX_WORKERS, len(slow_questions)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            future_map = {
+                executor.submit(_grade_one, q): (idx, q) for idx, q in slow_questions
             }
-            for r in results
-        ],
-    }
+            for future in as_completed(future_map):
+                idx, q = future_map[future]
+                qid = q.get("id")
+                qtype = (q.get("type") or "").strip().lower() or "short"
+                try:
+                    res = future.result()
+                except Exception as e:
+                    logger.error("Error grading %s in parallel: %s", qid, e)
+                    max_score = float(
+                        q.get("max_score") or q.get("marks") or _default_max_score(qtype)
+                    )
+                    res = GradeResult(
+                        question_id=qid,
+                        type=qtype,
+                        score=0.0,
+                        max_score=max_score,
+                        verdict="error",
+                        feedback=f"Grading failed: {e}",
+                    )
+                slots[idx] = res
 
-    if warnings:
-        result["warnings"] = warnings
+        results = [r for r in slots if r is not None]
 
-    return result
+        total = 0.0
+        max_total = 0.0
+        items: List[Dict[str, Any]] = []
+        for r in results:
+            total += r.score
+            max_total += r.max_score
+            items.append(_result_to_dict(r))
+        percentage = (total / max_total * 100.0) if max_total > 0 else 0.0
+
+        duration = time.perf_counter() - start_time
+        logger.info(
+            "Completed parallel grading quiz %s in %.2fs - %.1f/%.1f (%.1f%%)",
+            quiz_id,
+            duration,
+            total,
+            max_total,
+            percentage,
+        )
 
+        result: Dict[str, Any] = {
+            "quiz_id": quiz_id,
+            "total_score": round(total, 2),
+            "max_total": round(max_total, 2),
+            "percentage": round(percentage, 1),
+            "items": items,
+        }
+
+        if warnings:
+            result["warnings"] = warnings
+
+        return result
+
+    def grade_batch(
+        self,
+        *,
+        quiz: Dict[str, Any],
+        submissions: List[Tuple[str, Dict[str, Any]]],
+        policy: Optional[str] = None,
+        rubric_weighting: Optional[Dict[str, float]] = None,
+        max_workers: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Grade many students' responses to the same quiz. ``submissions`` is a
+        list of ``(student_id, responses)`` pairs; results come back in the
+        same order, each tagged with its ``student_id``.
+
+        Submissions run on up to ``max_workers`` threads (default
+        GRADER_BATCH_WORKERS). Test cases already execute in the sandbox
+        worker processes and LLM calls are network-bound, so threads overlap
+        both without pickling the grader or its API client. When submissions
+        run in parallel, each one grades its questions sequentially, so the
+        thread count stays at ``max_workers`` rather than multiplying by
+        GRADER_MAX_WORKERS against the same rate limiter and sandbox pool.
+        """
+        if not submissions:
+            return []
+
+        prewarm_sandbox()
 
+        workers = min(max_workers or GRADER_BATCH_WORKERS, len(submissions))
+        per_quiz_workers = 1 if workers > 1 else None
+
+        def _grade_one(submission: Tuple[str, Dict[str, Any]]) -> Dict[str, Any]:
+            student_id, responses = submission
+            try:
+                result = self.grade_quiz(
+                    quiz=quiz,
+                    responses=responses or {},
+                    policy=policy,
+                    rubric_weighting=rubric_weighting,
+                    max_workers=per_quiz_workers,
+                )
+            except Exception as e:
+                logger.error("Error grading submission %s: %s", student_id, e)
+                result = {
+                    "quiz_id": quiz.get("id"),
+                    "error": f"Grading failed: {e}",
+                    "total_score": 0.0,
+                    "max_total": 0.0,
+                    "percentage": 0.0,
+                    "items": [],
+                }
+            result["student_id"] = student_id
+            return result
+
+        if workers <= 1:
+            return [_grade_one(s) for s in submissions]
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="grader-batch"
+        ) as executor:
+            return list(executor.map(_grade_one, submissions))
 
     def _grade_assignment_task(
         self,
@@ -1810,7 +2366,7 @@ def grade_quiz_parallel(
         difficulty = (q.get("difficulty") or "medium").lower()
         has_code = bool(q.get("code_snippet"))
 
-        if not student_answer:
+        if _is_near_empty(student_answer):
             return GradeResult(
                 question_id=qid, type=assignment_type,
                 score=0.0, max_score=max_score,
@@ -1853,12 +2409,9 @@ def grade_quiz_parallel(
             policy=policy,
         )
 
-        system_prompt = self._assignment_system_prompt(assignment_type)
-
         try:
-            from llm import chat_json
-            raw = chat_json(
-                system_prompt=system_prompt,
+            raw = chat_json_cached(
+                system_prompt=_ASSIGNMENT_SYSTEM_PROMPT,
                 user_prompt=user_prompt,
                 api_key=self.api_key,
                 model=self.model,
@@ -1910,38 +2463,6 @@ def grade_quiz_parallel(
         return base
 
 
-    def _assignment_system_prompt(self, assignment_type: str) -> str:
-        type_guidance = {
-            "conceptual":  "Focus on depth of understanding. Accept paraphrased explanations.",
-            "scenario":    "Reward structured reasoning and trade-off awareness.",
-            "research":    "Check evidence quality, not opinion. Depth > breadth.",
-            "project":     "Assess feasibility and completeness of proposed solution.",
-            "case_study":  "Look for multi-stakeholder thinking and justified conclusions.",
-            "comparative": "Require explicit criteria for comparison, not just description.",
-        }.get(assignment_type, "Assess quality of reasoning and communication.")
-
-        return f"""You are an expert academic examiner grading open-ended assignment tasks.
-
-    IMPORTANT: There is NO single correct answer. You must assess quality of thinking.
-
-    Assignment type: {assignment_type.upper()}
-    Specific guidance: {type_guidance}
-
-    GRADING PRINCIPLES:
-    - A strong answer demonstrates deep understanding, not memorised facts
-    - Partial credit is normal — most real answers are partially correct
-    - Reward original thinking when it is sound
-    - Do not penalise alternative valid approaches
-    - Assess whether requirements are met, not whether a specific answer appears
-
-    VERDICT SCALE:
-    - "correct"           → score ≥ 80% of max (strong, meets all requirements)
-    - "partially_correct" → score 30–79% of max (shows understanding, gaps remain)
-    - "incorrect"         → score < 30% of max (does not demonstrate understanding)
-
-    Return ONLY valid JSON with keys: score, max_score, verdict, feedback, criteria."""
-
-
     def _build_assignment_grading_prompt(
         self, *, prompt_text, student_answer, context, requirements,
         grading_criteria, learning_objectives, deliverables, word_count_hint,
@@ -1987,9 +2508,14 @@ def grade_quiz_parallel(
             for name, w in weights.items()
         )
 
+        type_guidance = _ASSIGNMENT_TYPE_GUIDANCE.get(
+            assignment_type, "Assess quality of reasoning and communication."
+        )
+
         return f"""GRADE THIS OPEN-ENDED ASSIGNMENT ANSWER
 
     QUESTION TYPE: {assignment_type.upper()}
+    TYPE GUIDANCE: {type_guidance}
     DIFFICULTY: {difficulty}
     POLICY: {policy.upper()}
     MAX SCORE: {max_score}
@@ -2008,9 +2534,6 @@ def grade_quiz_parallel(
     GRADING RUBRIC (no single correct answer exists — grade reasoning quality):
     {criteria_section}
 
-    STUDENT ANSWER:
-    {student_answer}
-
     Return JSON with EXACTLY these keys:
     {{
     "score": <number 0 to {max_score}>,
@@ -2021,7 +2544,11 @@ def grade_quiz_parallel(
         {{"name": "<criterion>", "score": <number>, "max": <max_for_criterion>, "feedback": "<what was good/missing>"}}
     ]
     }}
-    Criterion scores must sum to the total score."""
+    Criterion scores must sum to the total score.
+
+    STUDENT ANSWER:
+    {clip_for_prompt(student_answer)}
+    """
 
 
     def _heuristic_assignment_score(
@@ -1,10 +1,31 @@
 import io
+import itertools
 import json
+import mmap
 import re
-from typing import Any, Dict, List, Tuple, Optional
+import tempfile
+import threading
+from typing import Any, BinaryIO, Callable, Dict, List, Tuple, Optional
 
 from PyPDF2 import PdfReader
 
+# PDFium (C) extracts text several times faster than pure-Python PyPDF2;
+# PyPDF2 remains the fallback when pypdfium2 is not installed.
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pragma: no cover - optional dependency
+    pdfium = None
+
+# PDFium is not thread-safe, not even across separate documents, and this
+# runs inside threaded request handlers. Every pdfium call in the process
+# goes through one lock; it is kept on the pypdfium2 module itself so the
+# question generator's utils/pdf_utils.py takes the same lock.
+_PDFIUM_LOCK = (
+    vars(pdfium).setdefault("_process_lock", threading.Lock())
+    if pdfium is not None
+    else None
+)
+
 
 def parse_json_from_str_or_file(data_or_bytes: Any) -> Dict[str, Any]:
     """Parse JSON from a dict, string, or file bytes."""
@@ -17,13 +38,30 @@ def parse_json_from_str_or_file(data_or_bytes: Any) -> Dict[str, Any]:
     raise ValueError("Unsupported JSON input type")
 
 
-def extract_pdf_text_from_file(file_bytes: bytes) -> str:
-    """
-    Extract text from PDF bytes using PyPDF2.
-    Adds simple page separators for more reliable segmentation.
-    """
+def _extract_pdf_text_pdfium(source: Any) -> str:
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(source)
+        try:
+            texts: List[str] = []
+            for page_num in range(len(pdf)):
+                page = pdf[page_num]
+                try:
+                    textpage = page.get_textpage()
+                    text = textpage.get_text_range().replace("\r\n", "\n")
+                    textpage.close()
+                except Exception:
+                    text = ""
+                finally:
+                    page.close()
+                texts.append(f"--- PAGE {page_num + 1} ---\n{text}")
+        finally:
+            pdf.close()
+    return "\n\n".join(texts)
+
+
+def _extract_pdf_text_pypdf2(stream: Any) -> str:
     try:
-        reader = PdfReader(io.BytesIO(file_bytes))
+        reader = PdfReader(stream)
         texts: List[str] = []
 
         for page_num, page in enumerate(reader.pages):
@@ -38,6 +76,69 @@ def extract_pdf_text_from_file(file_bytes: bytes) -> str:
         return ""
 
 
+def extract_pdf_text_from_file(file_bytes: bytes) -> str:
+    """
+    Extract text from PDF bytes using pypdfium2 when available, else PyPDF2.
+    Adds simple page separators for more reliable segmentation.
+    """
+    if pdfium is not None:
+        try:
+            return _extract_pdf_text_pdfium(file_bytes)
+        except Exception:
+            pass
+
+    return _extract_pdf_text_pypdf2(io.BytesIO(file_bytes))
+
+
+def _is_in_memory(stream: BinaryIO) -> bool:
+    """
+    True for streams whose data lives in memory. werkzeug spools small
+    uploads in a SpooledTemporaryFile, and calling fileno() on one that has
+    not rolled over yet would force it onto disk.
+    """
+    if isinstance(stream, io.BytesIO):
+        return True
+    return isinstance(stream, tempfile.SpooledTemporaryFile) and not getattr(
+        stream, "_rolled", True
+    )
+
+
+def extract_pdf_text_from_stream(stream: BinaryIO) -> str:
+    """
+    Extract text from an open binary PDF file. In-memory uploads are read
+    as bytes; for files already on disk pypdfium2 reads pages on demand and
+    the PyPDF2 fallback gets an mmap of the file.
+    """
+    stream.seek(0)
+    if _is_in_memory(stream):
+        return extract_pdf_text_from_file(stream.read())
+
+    if pdfium is not None:
+        try:
+            return _extract_pdf_text_pdfium(stream)
+        except Exception:
+            stream.seek(0)
+
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return _extract_pdf_text_pypdf2(stream)
+    try:
+        mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # empty file
+        return ""
+    try:
+        return _extract_pdf_text_pypdf2(mm)
+    finally:
+        mm.close()
+
+
+def extract_pdf_text_from_path(path: str) -> str:
+    """Extract text from a PDF on disk; see extract_pdf_text_from_stream."""
+    with open(path, "rb") as f:
+        return extract_pdf_text_from_stream(f)
+
+
 _Q_SPLIT_PATTERNS = [
     # "Q1:", "Q1.", "Q1)", "Question 1:"
     re.compile(
@@ -47,6 +148,37 @@ _Q_SPLIT_PATTERNS = [
     # "1.", "1)", "1-", "1:"
     re.compile(r"^\s*(\d+)\s*[\).:\-]\s+", re.MULTILINE),
 ]
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+
+# "Answer 1: ..."
+_RE_ANSWER_N = re.compile(
+    r"(?:Answer|Ans)\s*[:\-]?\s*(\d+)\s*[:\-]\s*(.+?)(?=(?:Answer|Ans)\s*[:\-]?\s*\d+|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+# "Q1 Answer: ..."
+_RE_Q_ANSWER = re.compile(
+    r"Q\s*(\d+)\s*(?:Answer|:)\s*[:\-]?\s*(.+?)(?=Q\s*\d+|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_RE_MCQ_LETTER = re.compile(r"\b([ABCD])\b", re.IGNORECASE)
+# Only reached when no standalone letter exists, e.g. "AnswerB" with the
+# space lost in extraction. A checked box ("[x] B") needs no pattern of its
+# own: its letter always matches _RE_MCQ_LETTER first.
+_RE_MCQ_ANSWER_LABELED = re.compile(
+    r"(?:Answer|Ans|Selected)\s*[:\-]?\s*([ABCD])\b", re.IGNORECASE
+)
+
+_RE_TF_TRUE = re.compile(r"\bTrue\b", re.IGNORECASE)
+_RE_TF_FALSE = re.compile(r"\bFalse\b", re.IGNORECASE)
+_RE_TF_LABELED = re.compile(
+    r"(?:Answer|Ans)\s*[:\-]?\s*(True|False)\b", re.IGNORECASE
+)
+_RE_TF_LETTER = re.compile(r"\b([TF])\b")
+
+_RE_FREEFORM_PREFIX = re.compile(
+    r"^(?:Answer|Ans|Response)\s*[:\-]?\s*", re.IGNORECASE
+)
 
 
 def _find_explicit_answers(text: str) -> Dict[int, str]:
@@ -56,22 +188,14 @@ def _find_explicit_answers(text: str) -> Dict[int, str]:
     answers: Dict[int, str] = {}
 
     # Pattern: "Answer 1: ..."
-    for match in re.finditer(
-        r"(?:Answer|Ans)\s*[:\-]?\s*(\d+)\s*[:\-]\s*(.+?)(?=(?:Answer|Ans)\s*[:\-]?\s*\d+|$)",
-        text,
-        re.IGNORECASE | re.DOTALL,
-    ):
+    for match in _RE_ANSWER_N.finditer(text):
         q_num = int(match.group(1))
         answer_text = match.group(2).strip()
         answer_text = answer_text.split("\n\n")[0].strip()
         answers[q_num] = answer_text
 
     # Pattern: "Q1 Answer: ..."
-    for match in re.finditer(
-        r"Q\s*(\d+)\s*(?:Answer|:)\s*[:\-]?\s*(.+?)(?=Q\s*\d+|$)",
-        text,
-        re.IGNORECASE | re.DOTALL,
-    ):
+    for match in _RE_Q_ANSWER.finditer(text):
         q_num = int(match.group(1))
         if q_num not in answers:
             answer_text = match.group(2).strip()
@@ -81,19 +205,26 @@ def _find_explicit_answers(text: str) -> Dict[int, str]:
     return answers
 
 
-def _split_pdf_into_segments(text: str) -> List[Tuple[Optional[int], str]]:
+def _split_pdf_into_segments(
+    text: str, max_segments: Optional[int] = None
+) -> List[Tuple[Optional[int], str]]:
     """
     Split PDF text into question segments.
     Returns list of (question_number, text_segment) tuples.
+    With max_segments, numbered splitting stops scanning once it has that
+    many segments (plus the match that ends the last one).
     """
     if not text:
         return []
 
+    limit = None if max_segments is None else max(max_segments, 1)
     for pat in _Q_SPLIT_PATTERNS:
-        matches = list(pat.finditer(text))
+        matches = list(
+            itertools.islice(pat.finditer(text), None if limit is None else limit + 1)
+        )
         if len(matches) >= 2:
             segments: List[Tuple[Optional[int], str]] = []
-            for i, m in enumerate(matches):
+            for i, m in enumerate(matches[:limit]):
                 try:
                     num = int(m.group(1))
                 except Exception:
@@ -106,21 +237,16 @@ def _split_pdf_into_segments(text: str) -> List[Tuple[Optional[int], str]]:
                 return segments
 
     # Fallback: paragraph-level splitting
-    paragraphs = [s.strip() for s in re.split(r"\n\s*\n", text) if s.strip()]
+    paragraphs = [s.strip() for s in _PARAGRAPH_SPLIT.split(text) if s.strip()]
     return [(None, p) for p in paragraphs]
 
 
 def _extract_mcq_answer(seg: str) -> Optional[str]:
     """Extract MCQ answer letter (A/B/C/D) from a text segment."""
-    m = re.search(r"\b([ABCD])\b", seg, re.IGNORECASE)
+    m = _RE_MCQ_LETTER.search(seg)
     if m:
         return m.group(1).upper()
-    m = re.search(
-        r"(?:Answer|Ans|Selected)\s*[:\-]?\s*([ABCD])\b", seg, re.IGNORECASE
-    )
-    if m:
-        return m.group(1).upper()
-    m = re.search(r"[\[\(][Xx✓✔][\]\)]\s*([ABCD])\b", seg, re.IGNORECASE)
+    m = _RE_MCQ_ANSWER_LABELED.search(seg)
     if m:
         return m.group(1).upper()
     return None
@@ -128,18 +254,16 @@ def _extract_mcq_answer(seg: str) -> Optional[str]:
 
 def _extract_tf_answer(seg: str) -> Optional[str]:
     """Extract True/False answer from segment."""
-    if re.search(r"\bTrue\b", seg, re.IGNORECASE):
+    if _RE_TF_TRUE.search(seg):
         return "True"
-    if re.search(r"\bFalse\b", seg, re.IGNORECASE):
+    if _RE_TF_FALSE.search(seg):
         return "False"
 
-    m = re.search(
-        r"(?:Answer|Ans)\s*[:\-]?\s*(True|False)\b", seg, re.IGNORECASE
-    )
+    m = _RE_TF_LABELED.search(seg)
     if m:
         return m.group(1).capitalize()
 
-    m = re.search(r"\b([TF])\b", seg)
+    m = _RE_TF_LETTER.search(seg)
     if m:
         return "True" if m.group(1).upper() == "T" else "False"
 
@@ -151,12 +275,7 @@ def _extract_freeform(seg: str) -> str:
     Extract free-form answer from text segment.
     Strips common prefixes and question repetition.
     """
-    cleaned = re.sub(
-        r"^(?:Answer|Ans|Response)\s*[:\-]?\s*",
-        "",
-        seg.strip(),
-        flags=re.IGNORECASE,
-    )
+    cleaned = _RE_FREEFORM_PREFIX.sub("", seg.strip())
 
     sentences = cleaned.split(".")
     if sentences and sentences[0].strip().endswith("?"):
@@ -165,6 +284,15 @@ def _extract_freeform(seg: str) -> str:
     return cleaned.strip()
 
 
+# Question types answered by a single token; everything else is free-form.
+_ANSWER_EXTRACTORS: Dict[str, Callable[[str], Optional[str]]] = {
+    "mcq": _extract_mcq_answer,
+    "true_false": _extract_tf_answer,
+    "truefalse": _extract_tf_answer,
+    "tf": _extract_tf_answer,
+}
+
+
 def responses_from_pdf_text(pdf_text: str, quiz: Dict[str, Any]) -> Dict[str, Any]:
     """
     Map PDF text to responses using multiple strategies:
@@ -175,31 +303,32 @@ def responses_from_pdf_text(pdf_text: str, quiz: Dict[str, Any]) -> Dict[str, An
     qlist = list(quiz.get("questions") or [])
 
     explicit_answers = _find_explicit_answers(pdf_text)
-    segments = _split_pdf_into_segments(pdf_text)
+    segments = _split_pdf_into_segments(pdf_text, max_segments=len(qlist))
 
     if len(segments) < len(qlist):
         segments = segments + [(None, "")] * (len(qlist) - len(segments))
 
     out: Dict[str, Any] = {}
 
+    # Whole-document fallbacks, computed on first use per extractor and
+    # shared by all questions (they do not depend on the question).
+    doc_answers: Dict[Callable[[str], Optional[str]], Optional[str]] = {}
+
     for idx, q in enumerate(qlist):
         qid = q.get("id", f"Q{idx + 1}")
-        qtype = (q.get("type") or "").strip().lower()
+        extract = _ANSWER_EXTRACTORS.get((q.get("type") or "").strip().lower())
 
         if (idx + 1) in explicit_answers:
             answer_text = explicit_answers[idx + 1]
         else:
             answer_text = segments[idx][1] if idx < len(segments) else ""
 
-        if qtype == "mcq":
-            ans = _extract_mcq_answer(answer_text) or _extract_mcq_answer(
-                pdf_text
-            )
-            out[qid] = ans
-        elif qtype in {"true_false", "truefalse", "tf"}:
-            ans = _extract_tf_answer(answer_text) or _extract_tf_answer(
-                pdf_text
-            )
+        if extract is not None:
+            ans = extract(answer_text)
+            if not ans:
+                if extract not in doc_answers:
+                    doc_answers[extract] = extract(pdf_text)
+                ans = doc_answers[extract]
             out[qid] = ans
         else:
             cleaned = _extract_freeform(answer_text)
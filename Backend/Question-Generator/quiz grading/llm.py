@@ -1,8 +1,121 @@
+import copy
+import hashlib
 import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
 from typing import Optional, Dict, Any
 
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
 
+logger = logging.getLogger(__name__)
+
+# On-disk cache for deterministic (low-temperature) grading calls.
+# Set GRADER_CACHE_DIR to an empty string to disable it.
+CACHE_DIR = os.getenv(
+    "GRADER_CACHE_DIR",
+    str(Path.home() / ".cache" / "quiz-grader"),
+)
+CACHE_MAX_ENTRIES = int(os.getenv("GRADER_CACHE_MAX_ENTRIES", "10000"))
+# In-process LRU in front of the disk cache (0 disables it).
+CACHE_MEMORY_ENTRIES = int(os.getenv("GRADER_CACHE_MEMORY_ENTRIES", "4096"))
+CACHEABLE_MAX_TEMPERATURE = 0.2
+# Part of every cache key: bump it (or set GRADER_CACHE_VERSION) to retire
+# cached responses, e.g. after a provider-side model update.
+CACHE_VERSION = os.getenv("GRADER_CACHE_VERSION", "1")
+
+# Ceiling on concurrent API calls per process, and how often a throttled
+# (429/503) call is retried after the client's own retries give up.
+LLM_MAX_CONCURRENCY = int(os.getenv("GRADER_LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_RETRIES = int(os.getenv("GRADER_LLM_MAX_RETRIES", "6"))
+
+
+_CLIENTS: Dict[str, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _get_client(api_key: str) -> Any:
+    """
+    Return a shared Groq client per API key. Reusing the client keeps its
+    HTTP connection pool alive, so calls after the first skip the TCP/TLS
+    handshake.
+    """
+    client = _CLIENTS.get(api_key)
+    if client is None:
+        from groq import Groq
+
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(api_key)
+            if client is None:
+                client = Groq(api_key=api_key)
+                _CLIENTS[api_key] = client
+    return client
+
+
+class _AdaptiveLimiter:
+    """
+    Concurrency limit for API calls that adapts to throttling: a throttled
+    call halves the limit, and every ``grow_after`` successful calls raise
+    it by one, up to ``max_limit``.
+    """
+
+    def __init__(self, max_limit: int, grow_after: int = 10) -> None:
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.grow_after = grow_after
+        self._inflight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._inflight >= self.limit:
+                self._cond.wait()
+            self._inflight += 1
+
+    def release(self, throttled: bool) -> None:
+        with self._cond:
+            self._inflight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.grow_after and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+_LIMITER = _AdaptiveLimiter(LLM_MAX_CONCURRENCY)
+
+
+def _is_throttled(error: Exception) -> bool:
+    return getattr(error, "status_code", None) in (429, 503)
+
+
+def _create_with_backoff(client: Any, **kwargs: Any) -> Any:
+    """Run one completion under the limiter, backing off on 429/503."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        throttled = False
+        _LIMITER.acquire()
+        try:
+            return client.chat.completions.create(**kwargs)
+        except Exception as e:
+            throttled = _is_throttled(e)
+            if not throttled or attempt == LLM_MAX_RETRIES:
+                raise
+        finally:
+            _LIMITER.release(throttled)
+        delay = min(30.0, 0.5 * 2 ** attempt)
+        logger.warning("API throttled; retrying in %.1fs", delay)
+        time.sleep(delay)
+
 
 def chat_json(
     *,
@@ -19,12 +132,11 @@ def chat_json(
     Uses JSON response_format and validates that the returned content
     is non-empty and valid JSON before returning.
     """
-    from groq import Groq
-
-    client = Groq(api_key=api_key)
+    client = _get_client(api_key)
 
     try:
-        chat = client.chat.completions.create(
+        chat = _create_with_backoff(
+            client,
             model=model or DEFAULT_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -35,7 +147,19 @@ def chat_json(
             response_format={"type": "json_object"},
         )
 
-        content = chat.choices[0].message.content
+        choice = chat.choices[0]
+        usage = getattr(chat, "usage", None)
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        if choice.finish_reason == "length":
+            logger.warning(
+                "Completion hit max_tokens=%d; response is truncated", max_tokens
+            )
+        elif completion_tokens >= 0.8 * max_tokens:
+            logger.info(
+                "Completion used %d of max_tokens=%d", completion_tokens, max_tokens
+            )
+
+        content = choice.message.content
         if not content:
             raise ValueError("Empty response from API")
 
@@ -45,3 +169,204 @@ def chat_json(
         raise ValueError(f"Failed to parse JSON response: {e}")
     except Exception as e:
         raise RuntimeError(f"API call failed: {e}")
+
+
+class _DiskCache:
+    """
+    Minimal content-addressed JSON cache: one file per key, LRU by mtime.
+    Hits touch the file; every ``prune_every`` writes the oldest entries
+    beyond ``max_entries`` are removed.
+    """
+
+    def __init__(self, root: str, max_entries: int, prune_every: int = 100) -> None:
+        self.root = Path(root).expanduser() if root else None
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.root is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        if self.root is None:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self._prune()
+
+    def _prune(self) -> None:
+        try:
+            entries = [
+                (p.stat().st_mtime, p) for p in self.root.glob("*/*.json")
+            ]
+        except OSError:
+            return
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        entries.sort(key=lambda e: e[0])
+        for _, p in entries[:excess]:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+class _MemoryCache:
+    """Thread-safe in-process LRU; values are copied on the way in and out."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                return None
+            self._data.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_MEMORY_CACHE = _MemoryCache(CACHE_MEMORY_ENTRIES)
+_RESPONSE_CACHE: Any = _DiskCache(CACHE_DIR, CACHE_MAX_ENTRIES)
+
+
+def set_response_cache(cache: Any) -> None:
+    """
+    Replace the persistent cache behind chat_json_cached, e.g. with a
+    wrapper around Redis shared by several servers. ``cache`` needs
+    ``get(key) -> dict | None`` and ``set(key, value)``; it should swallow
+    its own connection errors, since a cache miss is always safe.
+    """
+    global _RESPONSE_CACHE
+    _RESPONSE_CACHE = cache
+
+
+_INFLIGHT: Dict[str, "Future[Dict[str, Any]]"] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _cache_key(
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    h = hashlib.blake2b(digest_size=32)
+    for part in (
+        CACHE_VERSION,
+        system_prompt,
+        user_prompt,
+        model,
+        f"{temperature}",
+        f"{max_tokens}",
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def chat_json_cached(
+    *,
+    system_prompt: str,
+    user_prompt: str,
+    api_key: str,
+    model: Optional[str] = None,
+    temperature: float = 0.1,
+    max_tokens: int = 1500,
+    cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Same as chat_json, but low-temperature calls are served from the
+    in-memory or on-disk cache when the exact same prompt was graded before.
+    Pass ``cache=False`` to force a fresh call (the result is not stored).
+    """
+    model = model or DEFAULT_MODEL
+    if not cache or temperature > CACHEABLE_MAX_TEMPERATURE:
+        return chat_json(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            api_key=api_key,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+
+    key = _cache_key(system_prompt, user_prompt, model, temperature, max_tokens)
+    cached = _MEMORY_CACHE.get(key)
+    if cached is not None:
+        return cached
+    cached = _RESPONSE_CACHE.get(key)
+    if cached is not None:
+        _MEMORY_CACHE.set(key, cached)
+        return cached
+
+    # Single-flight: concurrent identical requests (e.g. the same answer
+    # submitted for duplicate questions) share one API call.
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _INFLIGHT[key] = future
+    if not leader:
+        return copy.deepcopy(future.result())
+
+    try:
+        result = chat_json(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            api_key=api_key,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        _MEMORY_CACHE.set(key, result)
+        _RESPONSE_CACHE.set(key, result)
+        future.set_result(result)
+        return copy.deepcopy(result)
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
@@ -1,4 +1,25 @@
-from typing import Dict, Any
+import json
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+# The user prompts below put everything that is fixed for a question
+# (rubric, reference, policy, instructions) first and the student's answer
+# last. Every submission to the same question then shares one long prompt
+# prefix, which providers with automatic prefix caching process once.
+
+# Longest student/reference text embedded in a prompt, in characters.
+# Anything longer is clipped so one oversized paste cannot blow up the
+# token cost and latency of a grading call.
+MAX_PROMPT_FIELD_CHARS = int(os.getenv("GRADER_MAX_PROMPT_FIELD_CHARS", "12000"))
+
+
+def clip_for_prompt(
+    text: Optional[str], limit: int = MAX_PROMPT_FIELD_CHARS
+) -> Optional[str]:
+    """Return ``text`` cut to ``limit`` characters, marking the cut."""
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit] + "\n...[truncated]"
 
 
 SYSTEM_PROMPT_GRADE = """
@@ -90,7 +111,21 @@ Reference: "Earth's axial tilt causes different hemispheres to receive varying s
 Student: "The distance from the sun changes throughout the year"
 Grade: {"score": 0.0, "verdict": "incorrect", ...}
 (Reason: Fundamental misconception)
-"""
+""".strip()
+
+
+def _freeform_criterion_maxes(
+    max_score: float, rubric_weights: Dict[str, float]
+) -> Tuple[float, float, float]:
+    """Accuracy/completeness/clarity maxima, adjusted to sum to max_score."""
+    accuracy_max = round(max_score * rubric_weights.get("accuracy", 0.5), 2)
+    completeness_max = round(max_score * rubric_weights.get("completeness", 0.3), 2)
+    clarity_max = round(max_score * rubric_weights.get("clarity", 0.2), 2)
+
+    total_criteria = accuracy_max + completeness_max + clarity_max
+    if abs(total_criteria - max_score) > 0.01:
+        accuracy_max = round(max_score - completeness_max - clarity_max, 2)
+    return accuracy_max, completeness_max, clarity_max
 
 
 def build_freeform_user_prompt(
@@ -104,18 +139,16 @@ def build_freeform_user_prompt(
 ) -> str:
     """Build grading prompt with explicit rubric calculations."""
 
-    accuracy_max = round(max_score * rubric_weights.get("accuracy", 0.5), 2)
-    completeness_max = round(max_score * rubric_weights.get("completeness", 0.3), 2)
-    clarity_max = round(max_score * rubric_weights.get("clarity", 0.2), 2)
-
-    total_criteria = accuracy_max + completeness_max + clarity_max
-    if abs(total_criteria - max_score) > 0.01:
-        accuracy_max = round(max_score - completeness_max - clarity_max, 2)
+    accuracy_max, completeness_max, clarity_max = _freeform_criterion_maxes(
+        max_score, rubric_weights
+    )
 
     ref_block = (
-        reference_answer
+        clip_for_prompt(reference_answer)
         or "(No reference provided - grade based on question prompt and general knowledge)"
     )
+    question_prompt = clip_for_prompt(question_prompt)
+    student_answer = clip_for_prompt(student_answer)
 
     return f"""
 GRADE THE FOLLOWING STUDENT ANSWER
@@ -146,9 +179,6 @@ QUESTION:
 REFERENCE/IDEAL ANSWER:
 {ref_block}
 
-STUDENT ANSWER:
-{student_answer}
-
 INSTRUCTIONS:
 1. Score each criterion independently
 2. Ensure criterion scores sum to total score
@@ -156,6 +186,63 @@ INSTRUCTIONS:
 4. Provide specific, actionable feedback
 5. Be consistent with the {policy} grading policy
 6. Return ONLY valid JSON (no markdown, no extra text)
+
+STUDENT ANSWER:
+{student_answer}
+"""
+
+
+def build_freeform_batch_user_prompt(
+    *,
+    items: List[Dict[str, Any]],
+    policy: str,
+) -> str:
+    """
+    Build one prompt grading several free-form answers. Each item carries
+    question_prompt, student_answer, reference_answer, max_score and
+    rubric_weights; the reply lists one SYSTEM_PROMPT_GRADE object per item.
+    """
+    payload = []
+    for n, item in enumerate(items):
+        accuracy_max, completeness_max, clarity_max = _freeform_criterion_maxes(
+            item["max_score"], item["rubric_weights"]
+        )
+        payload.append(
+            {
+                "item": n,
+                "question": clip_for_prompt(item["question_prompt"]),
+                "reference_answer": clip_for_prompt(item["reference_answer"])
+                or "(No reference provided - grade based on question prompt and general knowledge)",
+                "max_score": item["max_score"],
+                "criteria_max": {
+                    "accuracy": accuracy_max,
+                    "completeness": completeness_max,
+                    "clarity": clarity_max,
+                },
+                "student_answer": clip_for_prompt(item["student_answer"]),
+            }
+        )
+
+    return f"""
+GRADE EACH OF THE FOLLOWING STUDENT ANSWERS INDEPENDENTLY
+
+GRADING POLICY: {policy.upper()}
+
+For every item, score accuracy, completeness and clarity up to the maxima
+given in its criteria_max; criterion scores must sum to the item's score.
+Be consistent with the {policy} grading policy.
+
+Return JSON with one entry per item (no markdown, no extra text):
+{{
+  "results": [
+    {{"item": <item number>, "score": <number>, "max_score": <number>,
+      "verdict": "correct|partially_correct|incorrect", "feedback": "...",
+      "criteria": [{{"name": "accuracy", "score": <number>, "max": <number>, "feedback": "..."}}, ...]}}
+  ]
+}}
+
+ITEMS:
+{json.dumps(payload, ensure_ascii=False, indent=1)}
 """
 
 
@@ -208,7 +295,7 @@ Return JSON:
   "bugs_found": ["list of specific bugs or errors"],
   "strengths": ["what the student did well"]
 }
-"""
+""".strip()
 
 
 def build_code_grading_prompt(
@@ -222,6 +309,10 @@ def build_code_grading_prompt(
 ) -> str:
     """Build prompt for LLM-based code grading."""
 
+    question_prompt = clip_for_prompt(question_prompt)
+    student_code = clip_for_prompt(student_code)
+    reference_code = clip_for_prompt(reference_code)
+
     ref_block = (
         f"""
 REFERENCE SOLUTION:
@@ -255,11 +346,6 @@ REQUIREMENTS:
 
 {ref_block}
 
-STUDENT CODE:
-```python
-{student_code}
-```
-
 GRADING POLICY: {policy.upper()}
 {policy_guide}
 
@@ -270,7 +356,12 @@ Rubric:
 - Code Quality: {max_score * 0.3} points (30%)
 - Requirements: {max_score * 0.2} points (20%)
 
-Evaluate the code and return ONLY valid JSON.
+Evaluate the student code below and return ONLY valid JSON.
+
+STUDENT CODE:
+```python
+{student_code}
+```
 """
 
 
@@ -332,7 +423,7 @@ Return JSON:
   "key_strengths": ["what they did well"],
   "areas_for_improvement": ["what could be better"]
 }
-"""
+""".strip()
 
 
 def build_decision_grading_prompt(
@@ -347,6 +438,11 @@ def build_decision_grading_prompt(
 ) -> str:
     """Build prompt for decision-based question grading."""
 
+    scenario = clip_for_prompt(scenario)
+    question_prompt = clip_for_prompt(question_prompt)
+    student_answer = clip_for_prompt(student_answer)
+    reference_analysis = clip_for_prompt(reference_analysis)
+
     analysis_max = max_score * rubric_weights.get("analysis", 0.4)
     reasoning_max = max_score * rubric_weights.get("reasoning", 0.4)
     communication_max = max_score * rubric_weights.get("communication", 0.2)
@@ -379,9 +475,6 @@ QUESTION:
 
 {ref_block}
 
-STUDENT RESPONSE:
-{student_answer}
-
 GRADING RUBRIC:
 - Analysis: {analysis_max} points (40%) - Problem understanding & factor identification
 - Reasoning: {reasoning_max} points (40%) - Logic, trade-offs, justification
@@ -391,6 +484,9 @@ Maximum Score: {max_score}
 
 Policy: {policy.upper()}
 
-Evaluate comprehensively. Return ONLY valid JSON.
+Evaluate the student response below comprehensively. Return ONLY valid JSON.
+
+STUDENT RESPONSE:
+{student_answer}
 """
 
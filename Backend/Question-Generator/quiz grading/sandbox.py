@@ -0,0 +1,446 @@
+"""
+Persistent sandbox for running student code against test cases.
+
+Each worker is a long-lived ``python -I sandbox.py`` process that reads one
+JSON job per line on stdin and answers with one JSON line on stdout. Every
+test case runs in a child forked from the already-initialised worker, so the
+interpreter start-up cost is paid once per worker instead of once per test,
+while student code never shares state with another run.
+
+Where fork() is unavailable, ``run_batch`` runs each test case in its own
+fresh interpreter instead.
+"""
+
+import builtins
+import json
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from types import CodeType
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+SANDBOX_SCRIPT = os.path.abspath(__file__)
+
+# Address-space cap for each test run (student code only).
+MEMORY_LIMIT_MB = int(os.getenv("GRADER_SANDBOX_MEMORY_MB", "512"))
+
+# Extra seconds a worker gets on top of the per-test timeouts before the
+# parent assumes it is wedged and kills it.
+_WORKER_GRACE_SECONDS = 5.0
+
+# Captured stdout/stderr are truncated to this many characters per stream.
+_MAX_OUTPUT_CHARS = 1 << 20
+# Bytes read per stream before further output is drained and discarded.
+_MAX_OUTPUT_BYTES = 4 * _MAX_OUTPUT_CHARS
+
+# Exit status of a forked child that failed to set up its own sandbox.
+_SANDBOX_ERROR_EXIT = 125
+
+# Concurrent interpreters per submission in the run_batch fallback.
+_BATCH_WORKERS = 4
+
+_PR_SET_NO_NEW_PRIVS = 38
+
+
+def _load_libc() -> Any:
+    try:
+        import ctypes
+
+        return ctypes.CDLL(None, use_errno=True)
+    except Exception:
+        return None
+
+
+_LIBC = _load_libc() if __name__ == "__main__" else None
+
+
+def is_supported() -> bool:
+    """The pool needs fork() inside the worker to isolate each test run."""
+    return hasattr(os, "fork") and resource is not None
+
+
+# ── Worker side ──────────────────────────────────────────────────────────────
+
+def _harden_child(timeout: float) -> None:
+    """Apply resource limits to the forked child before running student code."""
+    cpu = max(1, int(timeout) + 1)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    mem = MEMORY_LIMIT_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+    if _LIBC is not None:
+        try:
+            _LIBC.prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+        except Exception:
+            pass
+    signal.alarm(cpu)
+
+
+def _exec_student_code(code: CodeType) -> None:
+    """
+    Run compiled student code as ``__main__`` on the stdio fds 0/1/2, the way
+    ``python3 script.py`` would: fresh text streams over the real descriptors,
+    so ``sys.stdin.buffer``, ``open(0)`` and ``os.write(1, ...)`` all work.
+    """
+    stdin = open(0, "r", encoding="utf-8", closefd=False)
+    out = open(1, "w", encoding="utf-8", closefd=False)
+    err = open(2, "w", encoding="utf-8", errors="backslashreplace", closefd=False)
+    sys.stdin = sys.__stdin__ = stdin
+    sys.stdout = sys.__stdout__ = out
+    sys.stderr = sys.__stderr__ = err
+    try:
+        exec(code, {"__name__": "__main__", "__builtins__": builtins})
+    except SystemExit:
+        pass
+    except BaseException as e:
+        # Skip this module's frame so the traceback starts in student code.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next, file=err)
+    finally:
+        # Student code may have swapped the streams; flush whatever is current
+        # as well as the originals, as interpreter shutdown would.
+        for stream in {id(s): s for s in (sys.stdout, sys.stderr, out, err)}.values():
+            try:
+                stream.flush()
+            except Exception:
+                pass
+
+
+def _compile_student_code(code: str) -> Tuple[Optional[CodeType], str]:
+    """Compile once per job; returns (code_object, "") or (None, error_text)."""
+    try:
+        return compile(code, "<student>", "exec"), ""
+    except (SyntaxError, ValueError) as e:
+        return None, "".join(traceback.format_exception_only(type(e), e))
+
+
+def _run_forked(code: CodeType, stdin_text: str, timeout: float) -> Dict[str, Any]:
+    """
+    Run one test case in a forked child and wait at most ``timeout`` s.
+
+    The test input is fed through a pipe on the child's fd 0 and fds 1/2 are
+    captured through pipes, so the child sees the same stdio as a fresh
+    ``python3`` process would.
+    """
+    in_r, in_w = os.pipe()
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # child
+        try:
+            # The worker's fds 0/1 carry the job protocol; replacing them
+            # keeps student code away from it.
+            os.dup2(in_r, 0)
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            for fd in (in_r, in_w, out_r, out_w, err_r, err_w):
+                os.close(fd)
+            _harden_child(timeout)
+        except BaseException as e:
+            try:
+                detail = "".join(traceback.format_exception_only(type(e), e))
+                os.write(2, detail.encode("utf-8", "replace"))
+            finally:
+                os._exit(_SANDBOX_ERROR_EXIT)
+        try:
+            _exec_student_code(code)
+        finally:
+            os._exit(0)
+
+    for fd in (in_r, out_w, err_w):
+        os.close(fd)
+
+    pending = memoryview(stdin_text.encode("utf-8"))
+    writer: Optional[int] = in_w
+    if pending:
+        os.set_blocking(in_w, False)
+    else:
+        os.close(in_w)
+        writer = None
+    captured: Dict[int, List[bytes]] = {out_r: [], err_r: []}
+    sizes = {out_r: 0, err_r: 0}
+    readers = [out_r, err_r]
+    timed_out = False
+    deadline = time.monotonic() + timeout
+    try:
+        while readers:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            ready_r, ready_w, _ = select.select(
+                readers, [writer] if writer is not None else [], [], remaining
+            )
+            if not ready_r and not ready_w:
+                timed_out = True
+                break
+            if ready_w:
+                try:
+                    pending = pending[os.write(writer, pending[:65536]):]
+                except BlockingIOError:
+                    pass
+                except BrokenPipeError:
+                    # The child stopped reading stdin; that is its business.
+                    pending = pending[:0]
+                if not pending:
+                    os.close(writer)
+                    writer = None
+            for fd in ready_r:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    readers.remove(fd)
+                elif sizes[fd] < _MAX_OUTPUT_BYTES:
+                    captured[fd].append(chunk)
+                    sizes[fd] += len(chunk)
+
+        # Output is closed; give the child the rest of its time to exit.
+        status = 0
+        while not timed_out:
+            waited, status = os.waitpid(pid, os.WNOHANG)
+            if waited:
+                break
+            if time.monotonic() >= deadline:
+                timed_out = True
+            else:
+                time.sleep(0.001)
+    finally:
+        for fd in [writer, out_r, err_r]:
+            if fd is not None:
+                os.close(fd)
+        if timed_out:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            os.waitpid(pid, 0)
+
+    if timed_out:
+        return {"stdout": "", "stderr": "", "timed_out": True}
+
+    stdout, stderr = (
+        b"".join(captured[fd]).decode("utf-8", errors="replace")[:_MAX_OUTPUT_CHARS]
+        for fd in (out_r, err_r)
+    )
+    if os.WIFEXITED(status) and os.WEXITSTATUS(status) == _SANDBOX_ERROR_EXIT:
+        raise RuntimeError(f"internal sandbox error: {stderr.strip()}")
+    if os.WIFSIGNALED(status):
+        # Child was killed (CPU / memory limit) before finishing.
+        return {
+            "stdout": "",
+            "stderr": "Process terminated (resource limit exceeded)",
+            "timed_out": False,
+        }
+    return {"stdout": stdout, "stderr": stderr, "timed_out": False}
+
+
+def _worker_main() -> None:
+    """Serve jobs from stdin until the parent closes the pipe."""
+    for line in sys.stdin:
+        try:
+            job = json.loads(line)
+            # Compile once here; every forked test child inherits the code
+            # object instead of re-parsing the source.
+            code, error = _compile_student_code(job["code"])
+            if code is None:
+                results = [
+                    {"stdout": "", "stderr": error, "timed_out": False}
+                    for _ in job["inputs"]
+                ]
+            else:
+                results = [
+                    _run_forked(code, stdin_text, float(job["timeout"]))
+                    for stdin_text in job["inputs"]
+                ]
+            reply: Dict[str, Any] = {"results": results}
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+# ── Parent side ──────────────────────────────────────────────────────────────
+
+class _Worker:
+    def __init__(self) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, "-I", SANDBOX_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def request(self, job: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        # If the worker wedges, kill it so readline() returns instead of
+        # blocking the grading thread forever.
+        watchdog = threading.Timer(deadline, self.kill)
+        watchdog.start()
+        try:
+            self.proc.stdin.write(json.dumps(job) + "\n")
+            self.proc.stdin.flush()
+            line = self.proc.stdout.readline()
+        finally:
+            watchdog.cancel()
+        if not line:
+            raise RuntimeError("sandbox worker exited unexpectedly")
+        return json.loads(line)
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.kill()
+
+
+class SandboxPool:
+    """Fixed-size pool of persistent sandbox worker processes."""
+
+    def __init__(self, size: int = 2) -> None:
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[_Worker]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._spawned = 0
+        self._closed = False
+
+    def _acquire(self) -> _Worker:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._spawned < self.size:
+                    self._spawned += 1
+                    try:
+                        return _Worker()
+                    except Exception:
+                        self._spawned -= 1
+                        raise
+            # Re-check periodically: a busy worker may be discarded instead
+            # of returned, freeing a slot to spawn a replacement.
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def prewarm(self) -> None:
+        """Start any missing workers now so the first job doesn't wait for them."""
+        while True:
+            with self._lock:
+                if self._closed or self._spawned >= self.size:
+                    return
+                self._spawned += 1
+            try:
+                worker = _Worker()
+            except Exception:
+                with self._lock:
+                    self._spawned -= 1
+                return
+            self._idle.put(worker)
+
+    def _discard(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._spawned -= 1
+
+    def _release(self, worker: _Worker) -> None:
+        if worker.alive() and not self._closed:
+            self._idle.put(worker)
+        else:
+            self._discard(worker)
+
+    def run(
+        self, code: str, inputs: List[str], timeout: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Run ``code`` once per stdin string in ``inputs``.
+        Returns one ``{"stdout", "stderr", "timed_out"}`` dict per input.
+        """
+        job = {"code": code, "inputs": inputs, "timeout": timeout}
+        deadline = timeout * max(1, len(inputs)) + _WORKER_GRACE_SECONDS
+        worker = self._acquire()
+        try:
+            reply = worker.request(job, deadline)
+        except Exception:
+            self._discard(worker)
+            raise
+        self._release(worker)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["results"]
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _run_script(path: str, stdin_text: str, timeout: float) -> Dict[str, Any]:
+    """Run ``path`` in a fresh interpreter with ``stdin_text`` on its stdin."""
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-I", "-X", "utf8", path],
+            input=stdin_text.encode("utf-8"),
+            capture_output=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {"stdout": "", "stderr": "", "timed_out": True}
+    return {
+        "stdout": proc.stdout.decode("utf-8", errors="replace")[:_MAX_OUTPUT_CHARS],
+        "stderr": proc.stderr.decode("utf-8", errors="replace")[:_MAX_OUTPUT_CHARS],
+        "timed_out": False,
+    }
+
+
+def run_batch(code: str, inputs: List[str], timeout: float) -> List[Dict[str, Any]]:
+    """
+    Alternative to ``SandboxPool.run`` for platforms without fork(): the code
+    is written to disk once and every input runs in its own interpreter, so
+    no test can see state left behind by another.
+    """
+    fd, path = tempfile.mkstemp(suffix=".py")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(code)
+        workers = max(1, min(_BATCH_WORKERS, len(inputs)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(
+                executor.map(lambda text: _run_script(path, text, timeout), inputs)
+            )
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import grader  # noqa: E402
+
+
+class CodeLlmEmptyAnswerTests(unittest.TestCase):
+    def setUp(self):
+        self.grader = grader.QuizGrader(api_key="test-key")
+        self.question = {
+            "id": "q1",
+            "type": "code_output",
+            "prompt": "What does print(list()) output?",
+            "max_score": 2,
+        }
+
+    def test_symbol_only_answer_is_sent_to_grading(self):
+        reply = {"score": 2, "verdict": "correct", "feedback": "Correct output."}
+        with mock.patch.object(grader, "chat_json_cached", return_value=reply) as chat:
+            result = self.grader._grade_code_with_llm(self.question, "[]", policy="balanced")
+        chat.assert_called_once()
+        self.assertIn("[]", chat.call_args.kwargs["user_prompt"])
+        self.assertEqual(result.score, 2.0)
+        self.assertEqual(result.verdict, "correct")
+
+    def test_empty_answer_skips_the_llm(self):
+        with mock.patch.object(grader, "chat_json_cached") as chat:
+            result = self.grader._grade_code_with_llm(self.question, "   ", policy="balanced")
+        chat.assert_not_called()
+        self.assertEqual(result.score, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
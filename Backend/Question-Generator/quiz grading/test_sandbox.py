@@ -0,0 +1,87 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sandbox  # noqa: E402
+
+
+@unittest.skipUnless(sandbox.is_supported(), "sandbox pool needs fork()")
+class SandboxPoolStdioTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = sandbox.SandboxPool(size=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def run_one(self, code, stdin_text="3 4\n"):
+        (run,) = self.pool.run(code, [stdin_text], 5.0)
+        self.assertFalse(run["timed_out"])
+        return run
+
+    def test_sys_stdin_read(self):
+        run = self.run_one("import sys\nprint(sum(map(int, sys.stdin.read().split())))")
+        self.assertEqual(run["stdout"], "7\n")
+
+    def test_sys_stdin_buffer(self):
+        run = self.run_one("import sys\nprint(sys.stdin.buffer.read().decode().split())")
+        self.assertEqual(run["stdout"], "['3', '4']\n")
+
+    def test_open_fd_zero(self):
+        run = self.run_one("print(open(0).read().split())")
+        self.assertEqual(run["stdout"], "['3', '4']\n")
+
+    def test_raw_fd_writes_are_captured(self):
+        run = self.run_one("import os\nos.write(1, b'raw\\n')\nos.write(2, b'err\\n')")
+        self.assertEqual(run["stdout"], "raw\n")
+        self.assertEqual(run["stderr"], "err\n")
+
+    def test_large_input_is_not_truncated(self):
+        run = self.run_one("import sys\nprint(len(sys.stdin.read()))", "x" * 300000)
+        self.assertEqual(run["stdout"], "300000\n")
+
+
+@unittest.skipUnless(sandbox.is_supported(), "sandbox needs fork()")
+class SandboxHardeningTests(unittest.TestCase):
+    def test_hardening_failure_is_an_internal_error(self):
+        code, _ = sandbox._compile_student_code("print('hi')")
+        with mock.patch.object(
+            sandbox, "_harden_child", side_effect=OSError("prctl failed")
+        ):
+            with self.assertRaisesRegex(RuntimeError, "internal sandbox error"):
+                sandbox._run_forked(code, "", 5.0)
+
+
+class RunBatchTests(unittest.TestCase):
+    def test_stdio_matches_a_fresh_interpreter(self):
+        code = (
+            "import os, sys\n"
+            "data = sys.stdin.buffer.read()\n"
+            "os.write(1, data.upper())\n"
+        )
+        runs = sandbox.run_batch(code, ["ab\n", "cd\n"], 5.0)
+        self.assertEqual([r["stdout"] for r in runs], ["AB\n", "CD\n"])
+
+    def test_tests_do_not_share_interpreter_state(self):
+        code = (
+            "import builtins, sys\n"
+            "print(hasattr(builtins, 'leak'), 'leaked_mod' in sys.modules)\n"
+            "builtins.leak = 1\n"
+            "sys.modules['leaked_mod'] = sys\n"
+        )
+        runs = sandbox.run_batch(code, ["", "", ""], 5.0)
+        self.assertEqual([r["stdout"] for r in runs], ["False False\n"] * 3)
+
+    def test_timeout_is_reported_per_test(self):
+        code = "import sys, time\nif sys.stdin.read() == 'slow':\n    time.sleep(10)\nprint('done')"
+        fast, slow = sandbox.run_batch(code, ["fast", "slow"], 1.0)
+        self.assertEqual(fast["stdout"], "done\n")
+        self.assertTrue(slow["timed_out"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 """API routes for quiz generation and management."""
 
 import json
+import time
 import uuid
 from typing import Dict, Any
 from flask import Blueprint, request, jsonify
@@ -214,7 +215,7 @@ def extract_subtopics():
         _SUBTOPIC_UPLOADS[upload_id] = {
             'text': raw_text, 
             'file_name': file_name,
-            'analysis': document_analysis
+            'timestamp': time.time(),
         }
 
         # Adaptive chunking for subtopic extraction
@@ -229,17 +230,11 @@ def extract_subtopics():
         elif total_chunks <= 6:
             sample_chunks = chunks_with_metadata
         else:
+            # Evenly spaced from the first chunk to the last
             num_samples = 6
-            step = max(1, total_chunks // num_samples)
-            indices = {0, total_chunks - 1}
-            
-            for i in range(1, num_samples - 1):
-                idx = i * step
-                if 0 <= idx < total_chunks:
-                    indices.add(idx)
-            
-            for idx in sorted(indices):
-                sample_chunks.append(chunks_with_metadata[idx])
+            span = (total_chunks - 1) / (num_samples - 1)
+            for i in range(num_samples):
+                sample_chunks.append(chunks_with_metadata[round(i * span)])
 
         sample_text = "\n\n".join(chunk['text'] for chunk in sample_chunks)
 
@@ -277,12 +272,13 @@ def extract_subtopics():
                         subs = [str(x).strip() for x in subtopics_llm_output[key] if str(x).strip()]
                         break
         
-        # Fallback if insufficient
-        if not subs or len(subs) < 3:
+        # Clean first so blank entries don't count, then fall back if insufficient
+        subs = [s for s in (str(x).strip() for x in subs) if s]
+        if len(subs) < 3:
             enhanced_subs = get_enhanced_fallback_subtopics(raw_text, document_analysis)
-            subs = list(dict.fromkeys(subs + enhanced_subs))[:10]
+            subs += [s for s in (str(x).strip() for x in enhanced_subs) if s]
 
-        subs = list(dict.fromkeys([str(s).strip() for s in subs if str(s).strip()]))[:10]
+        subs = list(dict.fromkeys(subs))[:10]
 
         return jsonify({
             "success": True,
@@ -505,17 +501,13 @@ def generate_advanced_assignment_from_topics():
         from services.db import save_quiz as save_quiz_to_store
         assignment_id = save_quiz_to_store(assignment_data)
 
-        # Index questions (non-critical)
+        # Index questions (non-critical, runs after the response)
         if embedder and embedder.is_available():
-            try:
-                embedder.index_quiz_questions(
-                    quiz_id=assignment_id,
-                    questions=questions,
-                    source='assignment_topics'
-                )
-                print(f"✅ Indexed {len(questions)} from topics assignment")
-            except Exception as e:
-                print(f"⚠️ Indexing failed: {e}")
+            embedder.index_quiz_questions_in_background(
+                quiz_id=assignment_id,
+                questions=questions,
+                source='assignment_topics'
+            )
             
         return jsonify({
             "success": True,
@@ -650,13 +642,9 @@ def generate_advanced_assignment():
         if not assignment_id:
             return jsonify({"error": "Failed to save assignment"}), 500
         
-        # Index (non-critical)
+        # Index (non-critical, runs after the response)
         if embedder and embedder.is_available():
-            try:
-                embedder.index_quiz_questions(assignment_id, questions, 'assignment_pdf')
-                print(f"✅ Indexed {len(questions)} assignment tasks")
-            except Exception as e:
-                print(f"⚠️ Indexing failed (non-critical): {e}")
+            embedder.index_quiz_questions_in_background(assignment_id, questions, 'assignment_pdf')
         
         # Clean up
         if upload_id in _SUBTOPIC_UPLOADS:
@@ -1,5 +1,6 @@
 """Embedding service for question similarity and duplicate prevention."""
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 # Import the embedding engine
@@ -30,6 +31,10 @@ class EmbeddingService:
         """Initialize embedding service."""
         self.embedder = question_embedder
         self.type = EMBEDDER_TYPE
+        # One worker: background indexing jobs run one at a time, in order
+        self._index_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="embedding-index"
+        )
         
         if self.embedder:
             print(f"✅ Embedding service initialized ({self.type})")
@@ -155,15 +160,16 @@ class EmbeddingService:
             return
         
         try:
+            docs = []
             for q in questions:
                 question_text = q.get('prompt', '')
                 if q.get('context'):
                     question_text = f"{question_text} [Context: {q.get('context')[:100]}]"
                 
-                self.add_question(
-                    question_id=f"{quiz_id}_{q.get('id', '')}",
-                    question_text=question_text,
-                    metadata={
+                docs.append({
+                    'id': f"{quiz_id}_{q.get('id', '')}",
+                    'text': question_text,
+                    'metadata': {
                         'type': q.get('type'),
                         'difficulty': q.get('difficulty'),
                         'tags': q.get('tags', []),
@@ -171,12 +177,35 @@ class EmbeddingService:
                         'source': source,
                         'has_code': bool(q.get('code_snippet'))
                     }
-                )
+                })
+            
+            if self.type == "firestore":
+                # Embeds all questions in one pass and writes one Firestore batch
+                self.embedder.add_questions_bulk(docs)
+            else:
+                for doc in docs:
+                    self.add_question(
+                        question_id=doc['id'],
+                        question_text=doc['text'],
+                        metadata=doc['metadata']
+                    )
             print(f"✅ Indexed {len(questions)} questions from {source}")
         except Exception as e:
             print(f"⚠️ Indexing failed: {e}")
 
 
+    def index_quiz_questions_in_background(self, quiz_id: str, questions: list, source: str = "quiz"):
+        """
+        Queue index_quiz_questions so the caller can respond without waiting
+        for embeddings to be computed and stored.
+        """
+        if not self.is_available():
+            return
+        self._index_executor.submit(
+            self.index_quiz_questions, quiz_id, list(questions), source
+        )
+
+
 # Global embedding service instance
 embedding_service: Optional[EmbeddingService] = None
 
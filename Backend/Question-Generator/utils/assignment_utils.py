@@ -1,7 +1,7 @@
 # utils/assignment_utils.py
 import json
 import re
-from groq import Groq
+from utils.groq_utils import get_groq_client
 
 ASSIGNMENT_SYSTEM_PROMPT = """You are an expert educational assessment designer specializing in creating diverse, challenging assignment questions.
 
@@ -182,7 +182,7 @@ def generate_advanced_assignments_llm(
         existing_context: Context about existing questions to avoid duplicates
     """
 
-    client = Groq(api_key=api_key)
+    client = get_groq_client(api_key)
 
     total_tasks = sum(task_distribution.values())
 
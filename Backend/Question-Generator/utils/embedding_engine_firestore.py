@@ -196,17 +196,26 @@ class FirestoreQuestionEmbedder:
         
         print(f"🔄 Bulk indexing {len(questions)} questions...")
         
+        items = []
         for q in questions:
             q_id = q.get('id', '')
             q_text = q.get('text', '') or q.get('prompt', '')
-            
-            if not q_id or not q_text:
+            if not q_id or not q_text.strip():
                 continue
-            
+            items.append((q_id, q_text, q))
+        
+        if not items:
+            return 0
+        
+        try:
+            # One batched forward pass for all texts instead of one per question
+            embeddings = self.model.encode([q_text for _, q_text, _ in items], batch_size=64)
+        except Exception as e:
+            print(f"  ⚠️ Failed to embed questions: {e}")
+            return 0
+        
+        for (q_id, q_text, q), embedding in zip(items, embeddings):
             try:
-                # Generate embedding
-                embedding = self.model.encode(q_text)
-                
                 # Prepare document
                 doc_data = {
                     'question_id': q_id,
@@ -221,6 +230,7 @@ class FirestoreQuestionEmbedder:
                 doc_ref = self.db.collection('question_embeddings').document(q_id)
                 batch.set(doc_ref, doc_data, merge=True)
                 batch_size += 1
+                self._update_cache(q_id, embedding)
                 
                 # Commit batch if reaching limit
                 if batch_size >= max_batch_size:
@@ -238,6 +248,7 @@ class FirestoreQuestionEmbedder:
             batch.commit()
             success_count += batch_size
         
+        self._stats['total_indexed'] += success_count
         print(f"✅ Bulk indexing complete: {success_count}/{len(questions)} questions")
         return success_count
     
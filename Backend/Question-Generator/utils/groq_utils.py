@@ -1,6 +1,9 @@
 # utils/groq_utils.py
 import json
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Any, Optional
 from groq import Groq
 from utils.duplicate_prevention import get_existing_questions_context
@@ -44,6 +47,22 @@ ALWAYS return a single JSON object with:
  ]
 }"""
 
+_GROQ_CLIENTS: Dict[str, Groq] = {}
+_GROQ_CLIENTS_LOCK = threading.Lock()
+
+
+def get_groq_client(api_key: str) -> Groq:
+    """Return a shared Groq client per API key so HTTP connections are reused."""
+    client = _GROQ_CLIENTS.get(api_key)
+    if client is None:
+        with _GROQ_CLIENTS_LOCK:
+            client = _GROQ_CLIENTS.get(api_key)
+            if client is None:
+                client = Groq(api_key=api_key)
+                _GROQ_CLIENTS[api_key] = client
+    return client
+
+
 def call_groq_json(
     system_prompt: str,
     user_prompt: str,
@@ -53,7 +72,7 @@ def call_groq_json(
     max_tokens: int = 2500,
 ) -> dict:
     """Call Groq in JSON mode and return parsed dict."""
-    client = Groq(api_key=api_key)
+    client = get_groq_client(api_key)
     chat = client.chat.completions.create(
         model=model or DEFAULT_GROQ_MODEL,
         messages=[
@@ -431,6 +450,13 @@ def _generate_fallback_questions(
     
     return questions
 
+# Subtopic quizzes with at least this many questions are split into
+# concurrent calls. Every call resends the excerpts and existing-question
+# context, so small quizzes stay a single call.
+SUBTOPIC_SPLIT_MIN_QUESTIONS = int(os.getenv("SUBTOPIC_SPLIT_MIN_QUESTIONS", "15"))
+# Upper bound on concurrent calls for one split quiz.
+SUBTOPIC_MAX_CALLS = int(os.getenv("SUBTOPIC_MAX_CALLS", "2"))
+
 def generate_quiz_from_subtopics_llm(
     *,
     full_text: str,
@@ -459,8 +485,6 @@ def generate_quiz_from_subtopics_llm(
     want_tf = int(totals.get("true_false") or 0)
     want_sh = int(totals.get("short") or 0)
     want_lg = int(totals.get("long") or 0)
-    
-    total_wanted = want_mcq + want_tf + want_sh + want_lg
 
     # ✅ ENHANCEMENT 1: Use MORE text from the document
     lines = [ln.strip() for ln in full_text.splitlines() if ln.strip()]
@@ -495,17 +519,6 @@ def generate_quiz_from_subtopics_llm(
     if want_lg:  parts.append(f"{want_lg} Long Answer")
     type_contract = ", ".join(parts)
     
-    # ✅ ENHANCEMENT 2: More explicit instruction to LLM
-    counts_contract = f"""
-CRITICAL REQUIREMENT - YOU MUST GENERATE EXACTLY:
-- {want_mcq} Multiple Choice Questions (MCQ)
-- {want_tf} True/False Questions
-- {want_sh} Short Answer Questions
-- {want_lg} Long Answer Questions
-TOTAL: {total_wanted} questions
-
-DO NOT generate fewer questions. If the text is limited, create reasonable questions based on the available content.
-"""
 
     system_prompt = """You are an expert exam-setter creating quizzes from specific subtopics. 
 Output STRICT JSON ONLY with no additional text.
@@ -533,8 +546,22 @@ DIFFICULTY LEVELS:
 OUTPUT FORMAT:
 {"questions":[{...}]}"""
 
+    # ✅ ENHANCEMENT 2: More explicit instruction to LLM
+    def _counts_contract(mcq: int, tf: int, sh: int, lg: int) -> str:
+        return f"""
+CRITICAL REQUIREMENT - YOU MUST GENERATE EXACTLY:
+- {mcq} Multiple Choice Questions (MCQ)
+- {tf} True/False Questions
+- {sh} Short Answer Questions
+- {lg} Long Answer Questions
+TOTAL: {mcq + tf + sh + lg} questions
+
+DO NOT generate fewer questions. If the text is limited, create reasonable questions based on the available content.
+"""
+
     # Include existing_context in the user prompt
-    user_prompt = f"""
+    def _user_prompt(counts_contract: str) -> str:
+        return f"""
 TARGET SUBTOPICS:
 {", ".join(chosen_subtopics) if chosen_subtopics else "General topics from the document"}
 
@@ -556,23 +583,64 @@ RELEVANT TEXT EXCERPTS:
 Return valid JSON only with EXACTLY the requested number of questions for each type.
 """
 
-    try:
+    wanted = [want_mcq, want_tf, want_sh, want_lg]
+    total_wanted = sum(wanted)
+
+    def _generate(counts: List[int]) -> List[dict]:
         # ✅ ENHANCEMENT 3: Increased max_tokens for better generation
+        # A split call only writes its share of the quiz; Groq counts
+        # max_tokens against the rate limit, so don't reserve the full 8000.
+        max_tokens = 8000  # Increased from 6000
+        if total_wanted and sum(counts) < total_wanted:
+            max_tokens = max(3000, max_tokens * sum(counts) // total_wanted)
         out = call_groq_json(
             system_prompt=system_prompt,
-            user_prompt=user_prompt,
+            user_prompt=_user_prompt(_counts_contract(*counts)),
             api_key=api_key,
             model=model,
-            max_tokens=8000,  # Increased from 6000
+            max_tokens=max_tokens,
             temperature=0.7,  # Slightly higher for more creativity with small docs
         )
-        
-        print(f"🔍 Raw LLM output: {len(out.get('questions', []))} questions generated")
+        return list(out.get("questions") or [])
+
+    # Large quizzes are split by question type into a few concurrent calls,
+    # so the quiz takes as long as the slowest share instead of one long
+    # generation. Types go to the least-loaded call, largest first.
+    n_calls = 1
+    if total_wanted >= SUBTOPIC_SPLIT_MIN_QUESTIONS:
+        n_calls = max(1, min(SUBTOPIC_MAX_CALLS, sum(1 for c in wanted if c)))
+    jobs = [[0, 0, 0, 0] for _ in range(n_calls)]
+    for i in sorted(range(4), key=lambda i: -wanted[i]):
+        if wanted[i]:
+            min(jobs, key=sum)[i] = wanted[i]
+
+    try:
+        raw_questions: List[dict] = []
+        if len(jobs) > 1:
+            errors = []
+            with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+                futures = [pool.submit(_generate, counts) for counts in jobs]
+                for counts, fut in zip(jobs, futures):
+                    try:
+                        raw_questions.extend(fut.result())
+                    except Exception as e:
+                        # Keep the other calls' questions; this share is
+                        # covered by the shortfall fallbacks below.
+                        print(f"⚠️  Subtopic generation failed for counts {counts}: {e}")
+                        errors.append(e)
+            if len(errors) == len(jobs):
+                raise errors[0]
+        else:
+            raw_questions = _generate(jobs[0])
+
+        print(f"🔍 Raw LLM output: {len(raw_questions)} questions generated")
         
         qs = []
-        for q in (out.get("questions") or []):
+        for q in raw_questions:
             s = _sanitize_question(q)
             if s:
+                # Separate calls each number their questions from q1.
+                s["id"] = f"q{len(qs) + 1}"
                 qs.append(s)
         
         print(f"✅ Sanitized questions: {len(qs)}")